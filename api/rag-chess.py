@@ -1,10 +1,220 @@
 # Vercel Serverless Function for Chess RAG (Retrieval-Augmented Generation)
 # Uses Pinecone for vector search + OpenAI embeddings
 
+from array import array
+from collections import OrderedDict
 from http.server import BaseHTTPRequestHandler
+import gzip
+import hashlib
+import http.client
+import io
 import json
 import os
-import urllib.request
+import random
+import select
+import threading
+import time
+import urllib.error
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:  # Optional - stdlib json is the fallback
+    orjson = None
+
+try:
+    import tiktoken
+except ImportError:  # Optional - fall back to a character-based estimate
+    tiktoken = None
+
+
+def json_dumps(obj) -> bytes:
+    """Serialize obj to UTF-8 JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode('utf-8')
+
+
+def json_loads(data: bytes):
+    """Parse UTF-8 JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode('utf-8'))
+
+
+# Shared worker pool for overlapping independent upstream calls. The calls
+# are network-bound, so threads release the GIL while waiting on sockets.
+_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+
+
+# Keep-alive HTTPS connections per upstream host. A warm lambda reuses them
+# across calls and invocations instead of paying a TCP+TLS handshake to
+# OpenAI / Pinecone / Anthropic every time.
+_MAX_IDLE_PER_HOST = 4
+# Per-socket-operation timeout, so a stalled upstream fails well inside the
+# 60 s Vercel function limit instead of hanging the invocation
+REQUEST_TIMEOUT = 20
+_POOL_LOCK = threading.Lock()
+_IDLE_CONNECTIONS = {}
+
+
+def _is_stale(conn) -> bool:
+    """True if an idle connection's socket was closed by the server.
+
+    An idle keep-alive socket has nothing to read, so a readable one means
+    the server sent EOF (or stray bytes) and the socket can't be reused.
+    """
+    if conn.sock is None:
+        return True
+    readable, _, _ = select.select([conn.sock], [], [], 0)
+    return bool(readable)
+
+
+def _acquire_connection(host: str):
+    """Return (connection, reused) for host, preferring an idle pooled one."""
+    with _POOL_LOCK:
+        idle = _IDLE_CONNECTIONS.get(host, [])
+        while idle:
+            conn = idle.pop()
+            if not _is_stale(conn):
+                return conn, True
+            conn.close()
+    return http.client.HTTPSConnection(host, timeout=REQUEST_TIMEOUT), False
+
+
+def _release_connection(host: str, conn) -> None:
+    """Return a connection to the pool, or close it if the pool is full."""
+    with _POOL_LOCK:
+        idle = _IDLE_CONNECTIONS.setdefault(host, [])
+        if len(idle) < _MAX_IDLE_PER_HOST:
+            idle.append(conn)
+            return
+    conn.close()
+
+
+# Transient upstream statuses worth retrying. Delays are capped well below
+# the 60 s Vercel function limit.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 3
+MAX_RETRY_DELAY = 10
+
+
+def _retry_delay(error: urllib.error.HTTPError, attempt: int) -> float:
+    """Seconds to wait before retrying: Retry-After if given, else exponential."""
+    retry_after = error.headers.get("Retry-After") if error.headers else None
+    try:
+        delay = float(retry_after)
+    except (TypeError, ValueError):
+        delay = 2 ** attempt
+    # Jitter keeps concurrent requests from retrying in lockstep
+    return min(MAX_RETRY_DELAY, max(0.0, delay)) + random.uniform(0, 0.25)
+
+
+def _send_post(url: str, payload: dict, headers: dict, max_retries: int = MAX_RETRIES):
+    """POST a JSON payload, retrying transient 429/5xx replies with backoff.
+
+    Returns (host, connection, response) with the response body unread.
+    Raises urllib.error.HTTPError for non-2xx responses, matching the
+    behaviour of urllib.request.urlopen.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return _send_post_once(url, payload, headers)
+        except urllib.error.HTTPError as e:
+            if e.code not in RETRY_STATUSES or attempt == max_retries:
+                raise
+            time.sleep(_retry_delay(e, attempt))
+
+
+def _send_post_once(url: str, payload: dict, headers: dict):
+    """POST a JSON payload over a pooled connection (single attempt)."""
+    parts = urllib.parse.urlsplit(url)
+    host = parts.netloc
+    path = parts.path or "/"
+    body = json_dumps(payload)
+    headers = {**headers, "Connection": "keep-alive"}
+
+    while True:
+        conn, reused = _acquire_connection(host)
+        try:
+            conn.request("POST", path, body=body, headers=headers)
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            if reused:
+                # The server dropped an idle keep-alive socket before the
+                # request went out; retry on a fresh connection
+                continue
+            raise
+        break
+
+    try:
+        response = conn.getresponse()
+    except (http.client.HTTPException, OSError):
+        # The request was sent and may have been acted on, so a failure
+        # here is not retried
+        conn.close()
+        raise
+
+    if response.status >= 400:
+        raw = _read_body(response)
+        _finish_response(host, conn, response)
+        raise urllib.error.HTTPError(url, response.status, response.reason,
+                                     response.headers, io.BytesIO(raw))
+
+    return host, conn, response
+
+
+def _read_body(response) -> bytes:
+    """Read a response body, undoing gzip content encoding."""
+    raw = response.read()
+    if response.getheader("Content-Encoding", "").lower() == "gzip":
+        raw = gzip.decompress(raw)
+    return raw
+
+
+def _finish_response(host: str, conn, response) -> None:
+    """Hand a fully read response's connection back to the pool."""
+    if response.will_close:
+        conn.close()
+    else:
+        _release_connection(host, conn)
+
+
+def post_json(url: str, payload: dict, headers: dict) -> dict:
+    """POST a JSON payload over a pooled connection and return the JSON reply."""
+    # Embedding vectors are large JSON arrays and compress well
+    host, conn, response = _send_post(url, payload, {**headers, "Accept-Encoding": "gzip"})
+    try:
+        raw = _read_body(response)
+    except (http.client.HTTPException, OSError):
+        conn.close()
+        raise
+    _finish_response(host, conn, response)
+
+    return json_loads(raw)
+
+
+def post_sse(url: str, payload: dict, headers: dict):
+    """POST a JSON payload and yield the decoded `data:` frames of an SSE reply."""
+    host, conn, response = _send_post(url, payload, headers)
+    try:
+        while True:
+            line = response.readline()
+            if not line:
+                break
+            line = line.strip()
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                continue
+            yield json_loads(data)
+    except BaseException:
+        # Abandoned or failed mid-stream - the socket can't be reused
+        conn.close()
+        raise
+    _finish_response(host, conn, response)
 
 
 def get_pinecone_host() -> str:
@@ -12,25 +222,71 @@ def get_pinecone_host() -> str:
     return os.environ.get("PINECONE_HOST_RAG_CHESS", "")
 
 
-def get_embedding(text: str, api_key: str) -> list:
-    """Get embedding from OpenAI API."""
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Coaching queries repeat a lot, so keep recent query embeddings in an LRU.
+# Vectors are stored as float32 arrays (~6 KB each for 1536 dimensions).
+_EMBEDDING_CACHE_SIZE = 512
+_EMBEDDING_CACHE = OrderedDict()
+_EMBEDDING_CACHE_LOCK = threading.Lock()
+
+
+def _embedding_cache_key(text: str) -> tuple:
+    """Key on the model and a digest of the normalized text to bound key size."""
+    normalized = " ".join(text.lower().split())
+    return (EMBEDDING_MODEL, hashlib.sha1(normalized.encode('utf-8')).hexdigest())
+
+
+def get_embeddings(texts: list, api_key: str) -> list:
+    """Get embeddings for several texts from OpenAI in one batched request.
+
+    Cached texts are served from the LRU; only misses are sent to OpenAI.
+    """
+    keys = [_embedding_cache_key(text) for text in texts]
+    vectors = [None] * len(texts)
+
+    with _EMBEDDING_CACHE_LOCK:
+        for i, key in enumerate(keys):
+            cached = _EMBEDDING_CACHE.get(key)
+            if cached is not None:
+                _EMBEDDING_CACHE.move_to_end(key)
+                vectors[i] = cached.tolist()
+
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if not missing:
+        return vectors
+
     request_body = {
-        "model": "text-embedding-3-small",
-        "input": text
+        "model": EMBEDDING_MODEL,
+        "input": [texts[i] for i in missing]
     }
 
-    req = urllib.request.Request(
+    data = post_json(
         "https://api.openai.com/v1/embeddings",
-        data=json.dumps(request_body).encode('utf-8'),
-        headers={
+        request_body,
+        {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {api_key}"
         }
     )
 
-    with urllib.request.urlopen(req) as response:
-        data = json.loads(response.read().decode('utf-8'))
-        return data["data"][0]["embedding"]
+    # Results carry an index; sort so they line up with the inputs
+    items = sorted(data["data"], key=lambda d: d["index"])
+
+    with _EMBEDDING_CACHE_LOCK:
+        for i, item in zip(missing, items):
+            vectors[i] = item["embedding"]
+            _EMBEDDING_CACHE[keys[i]] = array('f', item["embedding"])
+            _EMBEDDING_CACHE.move_to_end(keys[i])
+        while len(_EMBEDDING_CACHE) > _EMBEDDING_CACHE_SIZE:
+            _EMBEDDING_CACHE.popitem(last=False)
+
+    return vectors
+
+
+def get_embedding(text: str, api_key: str) -> list:
+    """Get embedding from OpenAI API."""
+    return get_embeddings([text], api_key)[0]
 
 
 def search_pinecone(query_vector: list, pinecone_key: str, n_results: int = 5) -> list:
@@ -45,27 +301,48 @@ def search_pinecone(query_vector: list, pinecone_key: str, n_results: int = 5) -
         "includeMetadata": True
     }
 
-    req = urllib.request.Request(
+    data = post_json(
         f"https://{pinecone_host}/query",
-        data=json.dumps(request_body).encode('utf-8'),
-        headers={
+        request_body,
+        {
             "Content-Type": "application/json",
             "Api-Key": pinecone_key
         }
     )
 
-    with urllib.request.urlopen(req) as response:
-        data = json.loads(response.read().decode('utf-8'))
-        return data.get("matches", [])
+    return data.get("matches", [])
+
+
+def search_docs(query, openai_key: str, pinecone_key: str, n_results: int = 5) -> list:
+    """Search chess knowledge base using vector similarity.
 
+    `query` may be a single string or a list of strings; a list is embedded
+    in one request and the matches of every query are merged, keeping the
+    best score per document.
+    """
+    queries = [query] if isinstance(query, str) else list(query)
+    query_vectors = get_embeddings(queries, openai_key)
 
-def search_docs(query: str, openai_key: str, pinecone_key: str, n_results: int = 5) -> list:
-    """Search chess knowledge base using vector similarity."""
-    query_vector = get_embedding(query, openai_key)
-    matches = search_pinecone(query_vector, pinecone_key, n_results)
+    if len(query_vectors) == 1:
+        match_lists = [search_pinecone(query_vectors[0], pinecone_key, n_results)]
+    else:
+        # Independent searches - run them concurrently
+        match_lists = list(_EXECUTOR.map(
+            lambda vector: search_pinecone(vector, pinecone_key, n_results),
+            query_vectors
+        ))
+
+    best = {}
+    for match_list in match_lists:
+        for match in match_list:
+            match_id = match.get("id")
+            if match_id not in best or match.get("score", 0) > best[match_id].get("score", 0):
+                best[match_id] = match
+
+    matches = sorted(best.values(), key=lambda m: m.get("score", 0), reverse=True)
 
     results = []
-    for match in matches:
+    for match in matches[:n_results]:
         metadata = match.get("metadata", {})
         results.append({
             "text": metadata.get("text", ""),
@@ -76,66 +353,172 @@ def search_docs(query: str, openai_key: str, pinecone_key: str, n_results: int =
     return results
 
 
-def format_context(results: list) -> str:
-    """Format search results into context string."""
+# Average characters per token, used when tiktoken is not installed
+_CHARS_PER_TOKEN = 4
+
+# text-embedding-3-small rejects inputs over 8191 tokens; the character cap
+# bounds tokenizer work on very large pasted games
+MAX_EMBEDDING_TOKENS = 8191
+MAX_EMBEDDING_CHARS = 32768
+
+DEFAULT_MAX_CONTEXT_TOKENS = 2048
+MAX_TOKENS_PER_DOC = 512
+
+
+def _load_encoder():
+    """Load the tokenizer once at cold start, or None if unavailable.
+
+    cl100k_base is the tokenizer of text-embedding-3-small and a close
+    enough estimate for budgeting the chat prompt.
+    """
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # The BPE table could not be loaded (e.g. no network on first use)
+        return None
+
+
+_ENCODER = _load_encoder()
+
+
+def truncate_to_tokens(text: str, max_tokens: int, tokens: list = None) -> tuple:
+    """Truncate text to at most max_tokens tokens; return (text, token_count).
+
+    `tokens` may carry the already-encoded text to skip re-tokenizing.
+    """
+    if _ENCODER is None:
+        max_chars = max_tokens * _CHARS_PER_TOKEN
+        text = text[:max_chars]
+        return text, -(-len(text) // _CHARS_PER_TOKEN)
+
+    if tokens is None:
+        # Treat text like "<|endoftext|>" as plain text instead of raising
+        tokens = _ENCODER.encode(text, disallowed_special=())
+    if len(tokens) > max_tokens:
+        tokens = tokens[:max_tokens]
+        text = _ENCODER.decode(tokens)
+    return text, len(tokens)
+
+
+def format_context(results: list, max_total_tokens: int = DEFAULT_MAX_CONTEXT_TOKENS,
+                   max_tokens_per_doc: int = MAX_TOKENS_PER_DOC) -> str:
+    """Format search results into context string.
+
+    Each document is capped at max_tokens_per_doc tokens and documents are
+    added best-score first while they fit in max_total_tokens; the first
+    one that doesn't fit and every lower-scoring match after it are
+    dropped whole, never cut mid-text. Only if even the best match doesn't
+    fit is it truncated to the budget, so some context is always returned.
+    """
     if not results:
         return "No relevant chess principles found in knowledge base."
 
+    texts = [doc.get("text", "") for doc in results]
+    # Tokenize every document in one batched call; KB text may contain
+    # special-token strings, which should count as plain text
+    if _ENCODER is not None:
+        token_lists = _ENCODER.encode_batch(texts, disallowed_special=())
+    else:
+        token_lists = [None] * len(texts)
+
     context_parts = []
-    for i, doc in enumerate(results, 1):
+    remaining = max_total_tokens
+    for i, (doc, text, tokens) in enumerate(zip(results, texts, token_lists), 1):
         title = doc.get("title", "Chess Principle")
-        text = doc.get("text", "")
-        context_parts.append(f"{i}. {title}:\n{text}")
+        capped, used = truncate_to_tokens(text, max_tokens_per_doc, tokens)
+        if used > remaining:
+            if context_parts:
+                break
+            capped, used = truncate_to_tokens(text, remaining, tokens)
+        remaining -= used
+        context_parts.append(f"{i}. {title}:\n{capped}")
 
     return "\n\n".join(context_parts)
 
 
-def call_llm(messages: list, system_prompt: str, api_key: str, model: str = "gpt-4o-mini", provider: str = "openai") -> str:
-    """Call LLM API (OpenAI or Anthropic)."""
+def build_llm_request(messages: list, system_prompt: str, api_key: str, model: str, provider: str,
+                      user: str = None, stream: bool = False) -> tuple:
+    """Build the (url, body, headers) of an OpenAI or Anthropic chat request.
 
+    `user` is a stable caller id; OpenAI uses it to route repeat callers to
+    the same prompt cache.
+    """
     if provider == "anthropic":
         request_body = {
             "model": model,
             "max_tokens": 4096,
-            "system": system_prompt,
+            # The system prompt is a module-level constant, so every request
+            # shares this prefix - mark it as an ephemeral cache breakpoint
+            "system": [
+                {
+                    "type": "text",
+                    "text": system_prompt,
+                    "cache_control": {"type": "ephemeral"}
+                }
+            ],
             "messages": messages
         }
+        if stream:
+            request_body["stream"] = True
 
-        req = urllib.request.Request(
+        return (
             "https://api.anthropic.com/v1/messages",
-            data=json.dumps(request_body).encode('utf-8'),
-            headers={
+            request_body,
+            {
                 "Content-Type": "application/json",
                 "x-api-key": api_key,
                 "anthropic-version": "2023-06-01"
             }
         )
 
-        with urllib.request.urlopen(req) as response:
-            data = json.loads(response.read().decode('utf-8'))
-            return data["content"][0]["text"]
-    else:
-        # OpenAI
-        openai_messages = [{"role": "system", "content": system_prompt}] + messages
-
-        request_body = {
-            "model": model,
-            "max_tokens": 4096,
-            "messages": openai_messages
+    # OpenAI
+    request_body = {
+        "model": model,
+        "max_tokens": 4096,
+        "messages": [{"role": "system", "content": system_prompt}, *messages]
+    }
+    if user:
+        request_body["user"] = user
+    if stream:
+        request_body["stream"] = True
+
+    return (
+        "https://api.openai.com/v1/chat/completions",
+        request_body,
+        {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
         }
+    )
 
-        req = urllib.request.Request(
-            "https://api.openai.com/v1/chat/completions",
-            data=json.dumps(request_body).encode('utf-8'),
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {api_key}"
-            }
-        )
 
-        with urllib.request.urlopen(req) as response:
-            data = json.loads(response.read().decode('utf-8'))
-            return data["choices"][0]["message"]["content"]
+def call_llm(messages: list, system_prompt: str, api_key: str, model: str = "gpt-4o-mini", provider: str = "openai", user: str = None) -> str:
+    """Call LLM API (OpenAI or Anthropic)."""
+    data = post_json(*build_llm_request(messages, system_prompt, api_key, model, provider, user))
+
+    if provider == "anthropic":
+        return data["content"][0]["text"]
+    return data["choices"][0]["message"]["content"]
+
+
+def stream_llm(messages: list, system_prompt: str, api_key: str, model: str = "gpt-4o-mini", provider: str = "openai", user: str = None):
+    """Call LLM API (OpenAI or Anthropic) with streaming, yielding text deltas."""
+    frames = post_sse(*build_llm_request(messages, system_prompt, api_key, model, provider, user, stream=True))
+
+    for frame in frames:
+        if provider == "anthropic":
+            if frame.get("type") == "content_block_delta":
+                text = frame.get("delta", {}).get("text")
+                if text:
+                    yield text
+        else:
+            choices = frame.get("choices") or []
+            if choices:
+                text = choices[0].get("delta", {}).get("content")
+                if text:
+                    yield text
 
 
 # Chess-specific system prompt
@@ -150,6 +533,36 @@ When analyzing games:
 
 The game analysis will be provided along with relevant context from the chess knowledge base. Use the knowledge base context to ground your analysis in established chess principles."""
 
+# Keep the system prompt above free of per-request data (timestamps, ids) so
+# it stays a byte-identical prefix that provider prompt caches can match.
+# The framing text of the user message is fixed as well; only the retrieved
+# context and the query vary.
+KB_CONTEXT_TEMPLATE = """[Chess Knowledge Base Context]
+{context}
+[End Chess Knowledge Base Context]"""
+
+
+def build_user_content(context: str, query: str, provider: str):
+    """Build the content of the RAG-augmented user message.
+
+    For Anthropic the knowledge base block and the query are separate text
+    blocks, with a cache breakpoint after the KB block so follow-up
+    questions that retrieve the same context reuse the cached prefix
+    (system prompt + KB). OpenAI gets a single string.
+    """
+    kb_block = KB_CONTEXT_TEMPLATE.format(context=context)
+    if provider == "anthropic":
+        return [
+            {"type": "text", "text": kb_block, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": query}
+        ]
+    return f"{kb_block}\n\n{query}"
+
+
+def get_cache_user_id(api_key: str) -> str:
+    """Derive a stable, non-reversible caller id from the API key."""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:32]
+
 
 class handler(BaseHTTPRequestHandler):
     def send_cors_headers(self):
@@ -168,11 +581,11 @@ class handler(BaseHTTPRequestHandler):
         self.send_header('Content-Type', 'application/json')
         self.send_cors_headers()
         self.end_headers()
-        self.wfile.write(json.dumps({
+        self.wfile.write(json_dumps({
             "status": "ok",
             "backend": "pinecone",
             "message": "Chess RAG API (Pinecone + OpenAI embeddings)"
-        }).encode())
+        }))
 
     def do_POST(self):
         def send_json_response(status_code, data):
@@ -180,12 +593,12 @@ class handler(BaseHTTPRequestHandler):
             self.send_header('Content-Type', 'application/json')
             self.send_cors_headers()
             self.end_headers()
-            self.wfile.write(json.dumps(data).encode())
+            self.wfile.write(json_dumps(data))
 
         try:
             content_length = int(self.headers.get('Content-Length', 0))
             post_data = self.rfile.read(content_length) if content_length > 0 else b'{}'
-            body = json.loads(post_data.decode('utf-8'))
+            body = json_loads(post_data)
         except (json.JSONDecodeError, ValueError) as e:
             send_json_response(400, {"error": f"Invalid request: {str(e)}"})
             return
@@ -197,6 +610,17 @@ class handler(BaseHTTPRequestHandler):
         api_key = body.get("apiKey")
         access_code = body.get("accessCode")
         n_results = body.get("nResults", 5)
+        stream = bool(body.get("stream", False))
+        max_context_tokens = body.get("maxContextTokens", DEFAULT_MAX_CONTEXT_TOKENS)
+
+        if not isinstance(query, str) or not query.strip():
+            send_json_response(400, {"error": "No query provided"})
+            return
+
+        if (isinstance(max_context_tokens, bool) or not isinstance(max_context_tokens, int)
+                or max_context_tokens <= 0):
+            send_json_response(400, {"error": "maxContextTokens must be a positive integer"})
+            return
 
         # Get API keys
         openai_key = None
@@ -220,20 +644,26 @@ class handler(BaseHTTPRequestHandler):
 
         try:
             # Search for relevant chess principles
-            results = search_docs(query, openai_key, pinecone_key, n_results)
-            context = format_context(results)
+            # Only the retrieval query is truncated; the LLM sees the full text
+            search_query, _ = truncate_to_tokens(query[:MAX_EMBEDDING_CHARS], MAX_EMBEDDING_TOKENS)
+            results = search_docs(search_query, openai_key, pinecone_key, n_results)
+            context = format_context(results, max_context_tokens)
 
             # Build augmented message with RAG context
-            user_message = f"""[Chess Knowledge Base Context]
-{context}
-[End Chess Knowledge Base Context]
-
-{query}"""
+            user_message = build_user_content(context, query, provider)
 
-            augmented_messages = messages + [{"role": "user", "content": user_message}]
+            # `messages` was parsed from this request body, so extend it in
+            # place rather than copying it
+            augmented_messages = messages
+            augmented_messages.append({"role": "user", "content": user_message})
 
             # Call LLM
-            response_text = call_llm(augmented_messages, CHESS_RAG_SYSTEM_PROMPT, openai_key, model, provider)
+            if stream:
+                self.stream_response(augmented_messages, openai_key, model, provider, context, query)
+                return
+
+            response_text = call_llm(augmented_messages, CHESS_RAG_SYSTEM_PROMPT, openai_key, model, provider,
+                                     user=get_cache_user_id(openai_key))
 
             send_json_response(200, {
                 "content": response_text,
@@ -243,3 +673,36 @@ class handler(BaseHTTPRequestHandler):
 
         except Exception as e:
             send_json_response(500, {"error": str(e)})
+
+    def stream_response(self, messages, api_key, model, provider, context, query):
+        """Forward LLM tokens to the client as server-sent events.
+
+        The first frame carries the retrieved context and query, then one
+        {"delta": ...} frame per token chunk, then {"done": true}. Errors after
+        the headers are sent are reported as an {"error": ...} frame.
+        """
+        def send_event(data):
+            self.wfile.write(b"data: " + json_dumps(data) + b"\n\n")
+            self.wfile.flush()
+
+        # Open the upstream stream first so connection errors still get a
+        # normal JSON error response from do_POST
+        deltas = stream_llm(messages, CHESS_RAG_SYSTEM_PROMPT, api_key, model, provider,
+                            user=get_cache_user_id(api_key))
+        first = next(deltas, None)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_cors_headers()
+        self.end_headers()
+
+        send_event({"context": context, "query": query})
+        try:
+            if first is not None:
+                send_event({"delta": first})
+            for delta in deltas:
+                send_event({"delta": delta})
+            send_event({"done": True})
+        except Exception as e:
+            send_event({"error": str(e)})
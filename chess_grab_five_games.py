@@ -11,11 +11,57 @@ import re
 import sys
 import os
 import argparse
+import heapq
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 
 USERNAME = 'tttstanley'
 DEFAULT_NUM_GAMES = 5
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Patterns compiled once at import
+_ALL_HEADERS_RE = re.compile(r'\[(\w+)\s+"([^"]+)"\]')
+_HEADER_LINE_RE = re.compile(r'^[ \t]*\[.*$', re.MULTILINE)
+_CLK_RE = re.compile(r'\s*\{\[%clk[^\}]*\}\s*')
+_WS_RE = re.compile(r'\s+')
+_DOTS_RE = re.compile(r'\.\.\..*$')
+_MOVE_SUFFIX_RE = re.compile(r'-\d+\..*$')
+_FIRST_MOVE_RE = re.compile(r'^(1\.\s*\S+)')
+
+
+def _open_month(username, year, month, headers, label):
+    """Request one monthly archive, returning the response with its body unread"""
+    archive_url = f"https://api.chess.com/pub/player/{username.lower()}/games/{year}/{str(month).zfill(2)}"
+
+    try:
+        # stream=True returns once the headers arrive; the body is only
+        # downloaded if the games are actually read
+        response = requests.get(archive_url, headers=headers, timeout=10, stream=True)
+        if response.ok:
+            return response
+        response.close()
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching {label} month: {e}")
+
+    return None
+
+
+def _read_games(response, label):
+    """Download and parse the games of an archive response (empty on error)"""
+    if response is None:
+        return []
+
+    try:
+        data = response.json()
+        if 'games' in data:
+            return data['games']
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Error fetching {label} month: {e}")
+    finally:
+        response.close()
+
+    return []
 
 
 def fetch_games(username, num_games=5):
@@ -25,69 +71,62 @@ def fetch_games(username, num_games=5):
         'Accept': 'application/json'
     }
 
-    games_list = []
     now = datetime.now()
     year = now.year
     month = now.month
 
-    # Try current month first
-    archive_url = f"https://api.chess.com/pub/player/{username.lower()}/games/{year}/{str(month).zfill(2)}"
-
-    try:
-        response = requests.get(archive_url, headers=headers, timeout=10)
-        if response.ok:
-            data = response.json()
-            if 'games' in data:
-                games_list.extend(data['games'])
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching current month: {e}")
+    prev_month = month - 1
+    prev_year = year
+    if prev_month == 0:
+        prev_month = 12
+        prev_year -= 1
 
-    # If not enough games, try previous month
-    if len(games_list) < num_games:
-        prev_month = month - 1
-        prev_year = year
-        if prev_month == 0:
-            prev_month = 12
-            prev_year -= 1
+    # Request current and previous month concurrently so the two round-trips
+    # overlap instead of running back to back
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        current = executor.submit(_open_month, username, year, month, headers, 'current')
+        previous = executor.submit(_open_month, username, prev_year, prev_month, headers, 'previous')
 
-        prev_url = f"https://api.chess.com/pub/player/{username.lower()}/games/{prev_year}/{str(prev_month).zfill(2)}"
+        # Archives are ordered oldest first, so the newest games are the tail
+        games_list = _read_games(current.result(), 'current')[-num_games:]
 
-        try:
-            response = requests.get(prev_url, headers=headers, timeout=10)
-            if response.ok:
-                data = response.json()
-                if 'games' in data:
-                    games_list.extend(data['games'])
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching previous month: {e}")
+        if len(games_list) < num_games:
+            games_list = _read_games(previous.result(), 'previous') + games_list
+        else:
+            # Enough games already - drop the previous month without
+            # downloading its body
+            response = previous.result()
+            if response is not None:
+                response.close()
 
-    # Sort by end_time (most recent first) and take last N
-    games_list.sort(key=lambda g: g.get('end_time', 0), reverse=True)
-    return games_list[:num_games]
+    # Take the N most recent by end_time, newest first, without a full sort
+    return heapq.nlargest(num_games, games_list, key=lambda g: g.get('end_time', 0))
 
 
-def extract_header(pgn_text, header_name):
-    """Extract a header value from PGN"""
-    pattern = rf'\[{header_name} "([^"]+)"\]'
-    match = re.search(pattern, pgn_text)
-    return match.group(1) if match else None
+def parse_headers(pgn_text):
+    """Parse every PGN header in one pass into a {name: value} dict"""
+    headers = {}
+    for match in _ALL_HEADERS_RE.finditer(pgn_text):
+        # Keep the first occurrence of a repeated header
+        headers.setdefault(match.group(1), match.group(2))
+    return headers
 
 
-def extract_opening_name(pgn_text):
+def extract_opening_name(headers):
     """Extract opening name from ECOUrl or Opening header"""
     # First try Opening header
-    opening = extract_header(pgn_text, 'Opening')
+    opening = headers.get('Opening')
     if opening and opening != 'Unknown':
         return opening
 
     # Parse from ECOUrl like: https://www.chess.com/openings/Italian-Game-Giuoco-Piano
-    eco_url = extract_header(pgn_text, 'ECOUrl')
+    eco_url = headers.get('ECOUrl')
     if eco_url and '/openings/' in eco_url:
         # Extract part after /openings/
         opening_part = eco_url.split('/openings/')[-1]
         # Remove move suffixes like "...4.Be2-O-O-5.O-O"
-        opening_part = re.sub(r'\.\.\..*$', '', opening_part)
-        opening_part = re.sub(r'-\d+\..*$', '', opening_part)
+        opening_part = _DOTS_RE.sub('', opening_part)
+        opening_part = _MOVE_SUFFIX_RE.sub('', opening_part)
         # Replace hyphens with spaces
         opening_name = opening_part.replace('-', ' ')
         if opening_name and opening_name != 'Undefined':
@@ -96,11 +135,11 @@ def extract_opening_name(pgn_text):
     return 'Unknown Opening'
 
 
-def get_result_for_player(pgn_text, username):
+def get_result_for_player(headers, username):
     """Determine if username won, lost, or drew, and who the opponent was"""
-    white = extract_header(pgn_text, 'White')
-    black = extract_header(pgn_text, 'Black')
-    result = extract_header(pgn_text, 'Result')
+    white = headers.get('White')
+    black = headers.get('Black')
+    result = headers.get('Result')
 
     username_lower = username.lower()
 
@@ -130,38 +169,86 @@ def get_result_for_player(pgn_text, username):
     return color, outcome, opponent
 
 
-def add_opening_comment(pgn_text, username):
-    """Add opening comment after first move, return clean PGN without headers/clocks"""
-    eco = extract_header(pgn_text, 'ECO') or '?'
-    opening = extract_opening_name(pgn_text)
-    color, outcome, opponent = get_result_for_player(pgn_text, username)
+def add_opening_comment(pgn_text, username, headers=None):
+    """Add opening comment after first move.
+
+    Returns (clean PGN without headers/clocks, info dict) where the dict holds
+    the eco, opening, color, outcome and opponent used in the comment.
+    """
+    if headers is None:
+        headers = parse_headers(pgn_text)
+    eco = headers.get('ECO') or '?'
+    opening = extract_opening_name(headers)
+    color, outcome, opponent = get_result_for_player(headers, username)
 
     # Build comment
     comment = f"{{opening: {eco} {opening}, {username} was {color} with {outcome} against {opponent}}}"
 
-    # Extract just the moves (skip headers)
-    lines = pgn_text.split('\n')
-    move_lines = []
-
-    for line in lines:
-        stripped = line.strip()
-        # Skip headers and empty lines
-        if stripped.startswith('[') or not stripped:
-            continue
-        move_lines.append(stripped)
-
-    moves_text = ' '.join(move_lines)
+    # Extract just the moves (drop header lines; the leftover newlines and
+    # blank lines are collapsed with the rest of the whitespace below)
+    moves_text = _HEADER_LINE_RE.sub('', pgn_text)
 
     # Remove clock annotations {[%clk ...]}
-    moves_text = re.sub(r'\s*\{\[%clk[^\}]*\}\s*', ' ', moves_text)
+    moves_text = _CLK_RE.sub(' ', moves_text)
     # Clean up extra whitespace
-    moves_text = re.sub(r'\s+', ' ', moves_text).strip()
+    moves_text = _WS_RE.sub(' ', moves_text).strip()
 
     # Insert comment after first move (after "1. e4" or "1. d4")
-    pattern = r'^(1\.\s*\S+)'
-    modified_moves = re.sub(pattern, rf'\1 {comment}', moves_text, count=1)
+    modified_moves = _FIRST_MOVE_RE.sub(lambda m: f'{m.group(1)} {comment}', moves_text, count=1)
+
+    info = {
+        'eco': eco,
+        'opening': opening,
+        'color': color,
+        'outcome': outcome,
+        'opponent': opponent,
+    }
+
+    return modified_moves, info
+
 
-    return modified_moves
+def game_key(game):
+    """Stable id for a Chess.com game, used to skip games saved by earlier runs"""
+    return game.get('uuid') or game.get('url') or (
+        f"{game.get('end_time', 0)}:{game.get('white', {}).get('username', '')}"
+        f":{game.get('black', {}).get('username', '')}")
+
+
+def load_saved_keys(index_file, output_file):
+    """
+    Load the ids of games already written to the output file.
+
+    A missing index, or one older than the output file (the file was
+    changed by something other than this script), counts as empty; a
+    stale one is removed so its ids don't come back on the next run.
+    """
+    try:
+        if os.path.getmtime(index_file) < os.path.getmtime(output_file):
+            print(f"Ignoring stale index {index_file}")
+            os.remove(index_file)
+            return set()
+        with open(index_file, encoding='utf-8') as f:
+            return {line.strip() for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+def append_saved_keys(index_file, keys):
+    """
+    Record newly written game ids in the sidecar index.
+
+    Call after every write to the output file, even with no keys: the index
+    is touched either way so it never looks older (stale) than the output.
+    """
+    data = ''.join(f"{key}\n" for key in keys).encode('utf-8')
+    # O_APPEND writes land at the end of the file even with concurrent runs
+    fd = os.open(index_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        if data:
+            os.write(fd, data)
+    finally:
+        os.close(fd)
+    os.utime(index_file)
 
 
 def main():
@@ -203,35 +290,59 @@ def main():
 
     print(f"Found {len(games)} games")
 
-    # Prepare PGN content with opening comments
-    pgn_entries = []
-    for i, game in enumerate(games, 1):
-        if 'pgn' not in game:
-            print(f"  Game {i}: No PGN available, skipping")
-            continue
-
-        pgn = game['pgn']
-        modified_pgn = add_opening_comment(pgn, username)
-        pgn_entries.append(modified_pgn)
-
-        # Print summary
-        eco = extract_header(pgn, 'ECO') or '?'
-        opening = extract_opening_name(pgn)
-        color, outcome, opponent = get_result_for_player(pgn, username)
-        print(f"  Game {i}: {eco} {opening[:40]} ({color}, {outcome} vs {opponent})")
-
     # Append to file (or create if doesn't exist)
     mode = 'a' if os.path.exists(output_file) else 'w'
     action = 'Appending to' if mode == 'a' else 'Creating'
 
-    with open(output_file, mode, encoding='utf-8') as f:
+    # Skip games an earlier run already appended to this file
+    index_file = f"{output_file}.idx"
+    if mode == 'a':
+        seen = load_saved_keys(index_file, output_file)
+        new_games = [g for g in games if game_key(g) not in seen]
+        if len(new_games) < len(games):
+            print(f"Skipping {len(games) - len(new_games)} games already in {output_file}")
+        games = new_games
+        if not games:
+            print("No new games to save")
+            return
+    else:
+        # New output file: ids left over from a deleted one don't apply
+        try:
+            os.remove(index_file)
+        except FileNotFoundError:
+            pass
+
+    # Write each game's PGN as soon as it is processed rather than joining
+    # them all in memory first
+    saved = 0
+    saved_keys = []
+    with open(output_file, mode, encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
         if mode == 'a':
             f.write('\n\n')  # Add separator if appending
-        f.write('\n\n'.join(pgn_entries))
+
+        for i, game in enumerate(games, 1):
+            if 'pgn' not in game:
+                print(f"  Game {i}: No PGN available, skipping")
+                continue
+
+            pgn = game['pgn']
+            modified_pgn, info = add_opening_comment(pgn, username)
+            if saved:
+                f.write('\n\n')
+            f.write(modified_pgn)
+            saved += 1
+            saved_keys.append(game_key(game))
+
+            # Print summary
+            print(f"  Game {i}: {info['eco']} {info['opening'][:40]} "
+                  f"({info['color']}, {info['outcome']} vs {info['opponent']})")
+
         f.write('\n')  # Trailing newline
 
+    append_saved_keys(index_file, saved_keys)
+
     print(f"\n{action} {output_file}")
-    print(f"Saved {len(pgn_entries)} games")
+    print(f"Saved {saved} games")
 
 
 if __name__ == "__main__":
@@ -4,8 +4,19 @@ Chess.com Game Analyzer with Pattern Recognition
 Fetches games from Chess.com and analyzes them for patterns and mistakes
 """
 
+import io
 import requests
+from requests.adapters import HTTPAdapter
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+try:
+    import orjson
+except ImportError:  # Optional faster JSON parser; requests' json() is the fallback
+    orjson = None
 from chess_pattern_analyzer import ChessPatternAnalyzer
 
 # Import functions from lichess_check.py if available
@@ -15,13 +26,58 @@ import os
 # Add current directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# Concurrent archive fetches in analyze_multiple_games; kept small to stay
+# within Chess.com rate limits
+FETCH_WORKERS = 4
+
+# Chess.com answers 429 when throttling; retry those requests, waiting for
+# Retry-After when given and backing off exponentially otherwise
+MAX_RETRIES = 4
+MAX_RETRY_DELAY = 30
+
+# Monthly archives searched by fetch_game_pgn: the current month and the one before
+ARCHIVE_MONTHS = 2
+
+# PGN patterns, compiled once at import
+_GAME_URL_RE = re.compile(r'/game/(live|daily)/(\d+)')
+_INFO_HEADERS = frozenset([
+    'Event', 'Site', 'Date', 'White', 'Black',
+    'Result', 'WhiteElo', 'BlackElo', 'TimeControl',
+    'ECO', 'Opening', 'Termination'
+])
+_ANY_HEADER_RE = re.compile(r'\[(\w+) "([^"]+)"\]')
+# Essential headers kept by _clean_pgn_for_display
+_DISPLAY_HEADERS = frozenset([
+    'Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result',
+    'WhiteElo', 'BlackElo', 'TimeControl', 'ECO', 'Termination'
+])
+_HEADER_TOKEN_RE = re.compile(r'\[(\w+) ')
+# Comments {...}, variations/evals (...) and [%...] annotations in one pass
+_STRIP_RE = re.compile(r'\{[^}]*\}|\([^)]*\)|\[%[^\]]*\]')
+# Comments, [%clk ...] clocks and black move numbers ("1...") in one pass
+_DISPLAY_STRIP_RE = re.compile(r'\{[^}]*\}|\[%clk[^\]]*\]|\d+\.\.\.')
+_WS_RE = re.compile(r'\s+')
+_RESULT_RE = re.compile(r'\s+(1-0|0-1|1/2-1/2|\*)\s*$')
+_MOVE_PAIR_RE = re.compile(r'(\d+\.\s+\S+(?:\s+\S+)?)')
+
+
+def _months_to_try(now, n):
+    """Yield (year, zero-padded month) for the n months ending at now, newest first"""
+    year, month = now.year, now.month
+    for _ in range(n):
+        yield year, str(month).zfill(2)
+        month -= 1
+        if month == 0:
+            month = 12
+            year -= 1
+
 
 def extract_game_id_from_url(url_or_id):
     """Extract game ID from Chess.com URL or return as-is"""
     if 'chess.com' in url_or_id:
         # Handle URLs like https://www.chess.com/game/live/145318794164
         # or https://www.chess.com/game/daily/12345
-        match = re.search(r'/game/(live|daily)/(\d+)', url_or_id)
+        match = _GAME_URL_RE.search(url_or_id)
         if match:
             game_type = match.group(1)
             game_id = match.group(2)
@@ -39,7 +95,134 @@ class ChesscomGameAnalyzer:
         """
         self.analyzer = ChessPatternAnalyzer(stockfish_path=stockfish_path)
 
-    def fetch_game_pgn(self, game_url, username=None):
+        # One keep-alive session for all Chess.com requests, so repeated
+        # archive fetches skip the TCP+TLS handshake. Headers comply with
+        # Chess.com API policies
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'Chess Pattern Analyzer (Python/requests)',
+            'Accept': 'application/json'
+        })
+        self.session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=20))
+
+        # Monthly archives already downloaded, keyed by (username, year, month),
+        # with their validators. Per-key locks stop concurrent fetches
+        # downloading the same archive
+        self._archive_cache = {}
+        self._archive_locks = {}
+        self._archive_locks_guard = threading.Lock()
+
+    def close(self):
+        """Close the HTTP session"""
+        self.session.close()
+
+    def _get(self, url, headers=None, max_retries=MAX_RETRIES):
+        """
+        GET a Chess.com URL over the shared session, retrying 429 responses
+
+        Args:
+            url: URL to fetch
+            headers: Optional extra request headers
+            max_retries: Times to retry a rate-limited request
+
+        Returns:
+            The response (still 429 if every retry was throttled)
+        """
+        for attempt in range(max_retries + 1):
+            response = self.session.get(url, headers=headers, timeout=10)
+            if response.status_code != 429 or attempt == max_retries:
+                return response
+            try:
+                delay = float(response.headers.get('Retry-After'))
+            except (TypeError, ValueError):
+                delay = 2 ** attempt
+            response.close()
+            print(f"  → Rate limited by Chess.com, retrying in {delay:g}s...")
+            time.sleep(min(MAX_RETRY_DELAY, max(0.0, delay)))
+
+    def _get_archive_index(self, username, year, month):
+        """
+        Get a player's monthly archive indexed by game ID, downloading it only once
+
+        Args:
+            username: Lowercase Chess.com username
+            year: Archive year
+            month: Archive month as a zero-padded string
+
+        Returns:
+            Dict mapping game ID to game dict, or None if the archive has no games
+        """
+        key = (username, year, month)
+        with self._archive_locks_guard:
+            lock = self._archive_locks.setdefault(key, threading.Lock())
+
+        with lock:
+            # Cached as (etag, last_modified, index). Past months never change,
+            # but the current month grows as games finish, so revalidate it
+            # with a conditional GET and reuse the cached index on 304
+            cached = self._archive_cache.get(key)
+            now = datetime.now()
+            is_current_month = (year, month) == (now.year, str(now.month).zfill(2))
+            if cached is not None and not is_current_month:
+                return cached[2]
+
+            conditional_headers = {}
+            if cached is not None:
+                etag, last_modified, _ = cached
+                if etag:
+                    conditional_headers['If-None-Match'] = etag
+                if last_modified:
+                    conditional_headers['If-Modified-Since'] = last_modified
+
+            archive_url = f"https://api.chess.com/pub/player/{username}/games/{year}/{month}"
+            archive_response = self._get(archive_url, headers=conditional_headers)
+            if archive_response.status_code == 304 and cached is not None:
+                return cached[2]
+            archive_response.raise_for_status()
+            # Archives hold a full PGN per game and run to several MB
+            if orjson is not None:
+                archive_data = orjson.loads(archive_response.content)
+            else:
+                archive_data = archive_response.json()
+            games = archive_data.get('games')
+            if games is not None:
+                # Game URLs end in the ID, e.g. .../game/live/145318794164
+                games = {game['url'].rsplit('/', 1)[-1]: game
+                         for game in games if 'url' in game}
+            self._archive_cache[key] = (
+                archive_response.headers.get('ETag'),
+                archive_response.headers.get('Last-Modified'),
+                games
+            )
+            return games
+
+    def _search_archive(self, username, year, month, game_id):
+        """
+        Look up a game in one monthly archive
+
+        Args:
+            username: Lowercase Chess.com username
+            year: Archive year
+            month: Archive month as a zero-padded string
+            game_id: Chess.com game ID
+
+        Returns:
+            PGN text string, or None if the game is not in that archive
+        """
+        print(f"  → Checking archive for {year}/{month}...")
+        archive_index = self._get_archive_index(username, year, month)
+        if archive_index is None:
+            print("  → No games found in archive")
+            return None
+
+        print(f"  → Searching through {len(archive_index)} games...")
+        game = archive_index.get(game_id)
+        if game and 'pgn' in game:
+            print(f"✓ Game found in archive!")
+            return game['pgn']
+        return None
+
+    def fetch_game_pgn(self, game_url, username=None, game_type=None, game_id=None):
         """
         Fetch PGN from Chess.com for a game URL
 
@@ -51,12 +234,15 @@ class ChesscomGameAnalyzer:
         Args:
             game_url: Chess.com game URL (e.g., https://www.chess.com/game/live/145318794164)
             username: Chess.com username (will prompt if not provided)
+            game_type: Game type already parsed from game_url (parsed if not provided)
+            game_id: Game ID already parsed from game_url (parsed if not provided)
 
         Returns:
             PGN text string
         """
         # Extract game type and ID from URL
-        game_type, game_id = extract_game_id_from_url(game_url)
+        if game_id is None:
+            game_type, game_id = extract_game_id_from_url(game_url)
         
         if not game_type:
             print("Error: Could not parse Chess.com URL")
@@ -74,69 +260,19 @@ class ChesscomGameAnalyzer:
         username = username.lower()
 
         try:
-            from datetime import datetime
-            
             print(f"Fetching {game_type} game {game_id} from Chess.com...")
             print(f"  → Username: {username}")
-            
-            # Try current month first
-            now = datetime.now()
-            year = now.year
-            month = str(now.month).zfill(2)
-            
-            print(f"  → Checking archive for {year}/{month}...")
-            
-            # Fetch player's monthly archive
-            # Add headers to comply with Chess.com API policies
-            headers = {
-                'User-Agent': 'Chess Pattern Analyzer (Python/requests)'
-            }
-            archive_url = f"https://api.chess.com/pub/player/{username}/games/{year}/{month}"
-            archive_response = requests.get(archive_url, headers=headers, timeout=10)
-            archive_response.raise_for_status()
-            archive_data = archive_response.json()
-            
-            # Find our specific game in the archive
-            if 'games' not in archive_data:
-                print("Error: No games found in archive")
-                return None
-            
-            print(f"  → Searching through {len(archive_data['games'])} games...")
-            
-            for game in archive_data['games']:
-                # Check if this is our game by matching the game ID
-                if 'url' in game and game_id in game['url']:
-                    if 'pgn' in game:
-                        print(f"✓ Game found in archive!")
-                        return game['pgn']
-            
-            # If not found in current month, try previous month
-            print(f"  → Game not found in current month, trying previous month...")
-            import time
-            time.sleep(1)  # Rate limiting - be nice to Chess.com API
-            prev_month = now.month - 1
-            prev_year = now.year
-            if prev_month == 0:
-                prev_month = 12
-                prev_year -= 1
-            
-            month = str(prev_month).zfill(2)
-            year = prev_year
-            
-            print(f"  → Checking archive for {year}/{month}...")
-            archive_url = f"https://api.chess.com/pub/player/{username}/games/{year}/{month}"
-            archive_response = requests.get(archive_url, headers=headers, timeout=10)
-            archive_response.raise_for_status()
-            archive_data = archive_response.json()
-            
-            if 'games' in archive_data:
-                print(f"  → Searching through {len(archive_data['games'])} games...")
-                for game in archive_data['games']:
-                    if 'url' in game and game_id in game['url']:
-                        if 'pgn' in game:
-                            print(f"✓ Game found in archive!")
-                            return game['pgn']
-            
+
+            # Try current month first, then step back month by month
+            for i, (year, month) in enumerate(_months_to_try(datetime.now(), ARCHIVE_MONTHS)):
+                if i:
+                    print(f"  → Game not found, trying previous month...")
+                    if (username, year, month) not in self._archive_cache:
+                        time.sleep(1)  # Rate limiting - be nice to Chess.com API
+                pgn = self._search_archive(username, year, month, game_id)
+                if pgn:
+                    return pgn
+
             print(f"Error: Game {game_id} not found in recent archives")
             print("The game might be:")
             print("  - From a different username (try the other player)")
@@ -168,31 +304,27 @@ class ChesscomGameAnalyzer:
         Returns:
             Cleaned PGN with just moves
         """
-        lines = pgn_text.split('\n')
-        move_lines = []
-
-        for line in lines:
-            line = line.strip()
-            # Skip empty lines and header lines (starting with [)
-            if not line or line.startswith('['):
-                continue
-            move_lines.append(line)
-
-        # Join all move lines
-        moves_text = ' '.join(move_lines)
-
-        # Remove clock annotations
-        moves_text = re.sub(r'\{[^}]*\}', '', moves_text)
-        # Remove eval annotations
-        moves_text = re.sub(r'\([^)]*\)', '', moves_text)
-        # Remove Chess.com specific annotations like [%clk 0:05:00]
-        moves_text = re.sub(r'\[%[^\]]*\]', '', moves_text)
+        pgn_text = pgn_text.lstrip()
+        if pgn_text.startswith('[') and '\n\n' in pgn_text:
+            # Standard PGN: the movetext follows the first blank line, so
+            # slice it off instead of filtering line by line
+            moves_text = pgn_text.split('\n\n', 1)[1]
+        else:
+            # Skip empty lines and header lines (starting with [); stray
+            # whitespace is collapsed below
+            moves_text = ' '.join(line for line in pgn_text.splitlines()
+                                  if line and not line.lstrip().startswith('['))
+
+        # Remove clock/eval annotations and Chess.com specific annotations
+        # like [%clk 0:05:00]
+        moves_text = _STRIP_RE.sub('', moves_text)
         # Clean up whitespace
-        moves_text = re.sub(r'\s+', ' ', moves_text).strip()
+        moves_text = _WS_RE.sub(' ', moves_text).strip()
 
         return moves_text
 
-    def analyze_chesscom_game(self, game_url, username=None, output_file=None):
+    def analyze_chesscom_game(self, game_url, username=None, output_file=None,
+                              game_id=None, game_type=None):
         """
         Analyze a Chess.com game by URL
 
@@ -200,13 +332,34 @@ class ChesscomGameAnalyzer:
             game_url: Chess.com game URL
             username: Chess.com username (will prompt if not provided)
             output_file: Optional output filename for report
+            game_id: Game ID already parsed from game_url (parsed if not provided)
+            game_type: Game type already parsed from game_url (parsed if not provided)
 
         Returns:
             Analysis results dict
         """
+        # Parse the URL once and hand the result to both steps
+        if game_id is None:
+            game_type, game_id = extract_game_id_from_url(game_url)
+
         # Fetch PGN from Chess.com
-        pgn_text = self.fetch_game_pgn(game_url, username)
+        pgn_text = self.fetch_game_pgn(game_url, username, game_type, game_id)
+
+        return self._analyze_pgn(pgn_text, game_url, output_file, game_id)
+
+    def _analyze_pgn(self, pgn_text, game_url, output_file=None, game_id=None):
+        """
+        Analyze an already fetched Chess.com game and write its report
 
+        Args:
+            pgn_text: PGN text from fetch_game_pgn (None if the fetch failed)
+            game_url: Chess.com game URL
+            output_file: Optional output filename for report
+            game_id: Game ID already parsed from game_url (parsed if not provided)
+
+        Returns:
+            Analysis results dict
+        """
         if not pgn_text:
             return {'error': 'Could not fetch game from Chess.com'}
 
@@ -232,7 +385,8 @@ class ChesscomGameAnalyzer:
         # Add game metadata
         results['game_info'] = game_info
         results['full_pgn'] = pgn_text  # Store full PGN for report
-        game_type, game_id = extract_game_id_from_url(game_url)
+        if game_id is None:
+            game_type, game_id = extract_game_id_from_url(game_url)
         results['game_id'] = game_id
         results['chesscom_url'] = game_url
 
@@ -247,17 +401,12 @@ class ChesscomGameAnalyzer:
     def _extract_game_info(self, pgn_text):
         """Extract game metadata from PGN headers"""
         info = {}
-        headers = [
-            'Event', 'Site', 'Date', 'White', 'Black',
-            'Result', 'WhiteElo', 'BlackElo', 'TimeControl',
-            'ECO', 'Opening', 'Termination'
-        ]
-
-        for header in headers:
-            pattern = rf'\[{header} "([^"]+)"\]'
-            match = re.search(pattern, pgn_text)
-            if match:
-                info[header] = match.group(1)
+
+        # Headers come before the first blank line; scan only that block
+        header_block = pgn_text.lstrip().split('\n\n', 1)[0]
+        for header, value in _ANY_HEADER_RE.findall(header_block):
+            if header in _INFO_HEADERS and header not in info:
+                info[header] = value
 
         return info
 
@@ -266,12 +415,6 @@ class ChesscomGameAnalyzer:
         Clean PGN for display - essential headers + compact moves on one line
         Based on format_moves_compact from lichess_check.py
         """
-        # Essential headers to keep
-        essential_headers = [
-            'Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result',
-            'WhiteElo', 'BlackElo', 'TimeControl', 'ECO', 'Termination'
-        ]
-
         lines = pgn_text.split('\n')
         header_lines = []
         move_lines = []
@@ -281,10 +424,9 @@ class ChesscomGameAnalyzer:
             line_stripped = line.strip()
             if line_stripped.startswith('['):
                 # Check if essential header
-                for header in essential_headers:
-                    if line_stripped.startswith(f'[{header} '):
-                        header_lines.append(line)
-                        break
+                match = _HEADER_TOKEN_RE.match(line_stripped)
+                if match and match.group(1) in _DISPLAY_HEADERS:
+                    header_lines.append(line)
             elif line_stripped and not line_stripped.startswith('['):
                 # This is a move line
                 move_lines.append(line_stripped)
@@ -292,16 +434,13 @@ class ChesscomGameAnalyzer:
         # Format moves compactly with line wrapping
         if move_lines:
             moves_text = ' '.join(move_lines).strip()
-            # Remove clock annotations
-            moves_text = re.sub(r'\{[^}]*\}', '', moves_text)
-            # Remove Chess.com clock: [%clk 0:09:59.7]
-            moves_text = re.sub(r'\[%clk[^\]]*\]', '', moves_text)
-            # Remove black move numbers (e.g., "1...")
-            moves_text = re.sub(r'\d+\.\.\.', '', moves_text)
+            # Remove clock annotations, Chess.com clock: [%clk 0:09:59.7]
+            # and black move numbers (e.g., "1...")
+            moves_text = _DISPLAY_STRIP_RE.sub('', moves_text)
             # Remove extra whitespace
-            moves_text = re.sub(r'\s+', ' ', moves_text).strip()
+            moves_text = _WS_RE.sub(' ', moves_text).strip()
             # Remove game result at the end if present
-            moves_text = re.sub(r'\s+(1-0|0-1|1/2-1/2|\*)\s*$', '', moves_text)
+            moves_text = _RESULT_RE.sub('', moves_text)
 
             # Wrap moves to ~70 characters per line
             wrapped_moves = self._wrap_moves(moves_text, max_length=70)
@@ -324,14 +463,13 @@ class ChesscomGameAnalyzer:
             Wrapped moves with newlines
         """
         # Split by move numbers to keep move pairs together
-        move_pattern = r'(\d+\.\s+\S+(?:\s+\S+)?)'
-        moves = re.findall(move_pattern, moves_text)
-
         lines = []
         current_line = []
         current_length = 0
 
-        for move in moves:
+        # Stream the move pairs rather than collecting them all first
+        for match in _MOVE_PAIR_RE.finditer(moves_text):
+            move = match.group(1)
             move_length = len(move)
 
             # If adding this move would exceed max_length, start new line
@@ -353,44 +491,49 @@ class ChesscomGameAnalyzer:
         """Generate enhanced report with Chess.com-specific features"""
         from datetime import datetime
 
+        # Build our section in memory and write it in one call
+        buf = io.StringIO()
+        w = buf.write
+        w("="*70 + "\n")
+        w("CHESS.COM GAME ANALYSIS REPORT\n")
+        w(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        w("="*70 + "\n\n")
+
+        # Game information
+        w("GAME INFORMATION\n")
+        w("-"*70 + "\n")
+        game_info = results.get('game_info', {})
+        w(f"Game URL: {results['chesscom_url']}\n")
+        w(f"White: {game_info.get('White', 'Unknown')} "
+          f"({game_info.get('WhiteElo', '?')})\n")
+        w(f"Black: {game_info.get('Black', 'Unknown')} "
+          f"({game_info.get('BlackElo', '?')})\n")
+        w(f"Result: {game_info.get('Result', 'Unknown')}\n")
+        w(f"Date: {game_info.get('Date', 'Unknown')}\n")
+        w(f"Time Control: {game_info.get('TimeControl', 'Unknown')}\n")
+
+        if 'ECO' in game_info:
+            w(f"Opening (ECO): {game_info.get('ECO', '')}\n")
+        if 'Opening' in game_info:
+            w(f"Opening Name: {game_info.get('Opening', '')}\n")
+        if 'Termination' in game_info:
+            w(f"Termination: {game_info.get('Termination', '')}\n")
+
+        # Add cleaned PGN section
+        if 'full_pgn' in results:
+            w("\n" + "-"*70 + "\n")
+            w("PGN (Essential Headers + Moves)\n")
+            w("-"*70 + "\n")
+
+            # Clean PGN - keep only essential headers
+            clean_pgn = self._clean_pgn_for_display(results['full_pgn'])
+            w(clean_pgn)
+            w("\n")
+
+        w("\n")
+
         with open(output_file, 'w', encoding='utf-8') as f:
-            f.write("="*70 + "\n")
-            f.write("CHESS.COM GAME ANALYSIS REPORT\n")
-            f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("="*70 + "\n\n")
-
-            # Game information
-            f.write("GAME INFORMATION\n")
-            f.write("-"*70 + "\n")
-            game_info = results.get('game_info', {})
-            f.write(f"Game URL: {results['chesscom_url']}\n")
-            f.write(f"White: {game_info.get('White', 'Unknown')} "
-                   f"({game_info.get('WhiteElo', '?')})\n")
-            f.write(f"Black: {game_info.get('Black', 'Unknown')} "
-                   f"({game_info.get('BlackElo', '?')})\n")
-            f.write(f"Result: {game_info.get('Result', 'Unknown')}\n")
-            f.write(f"Date: {game_info.get('Date', 'Unknown')}\n")
-            f.write(f"Time Control: {game_info.get('TimeControl', 'Unknown')}\n")
-
-            if 'ECO' in game_info:
-                f.write(f"Opening (ECO): {game_info.get('ECO', '')}\n")
-            if 'Opening' in game_info:
-                f.write(f"Opening Name: {game_info.get('Opening', '')}\n")
-            if 'Termination' in game_info:
-                f.write(f"Termination: {game_info.get('Termination', '')}\n")
-
-            # Add cleaned PGN section
-            if 'full_pgn' in results:
-                f.write("\n" + "-"*70 + "\n")
-                f.write("PGN (Essential Headers + Moves)\n")
-                f.write("-"*70 + "\n")
-
-                # Clean PGN - keep only essential headers
-                clean_pgn = self._clean_pgn_for_display(results['full_pgn'])
-                f.write(clean_pgn)
-                f.write("\n")
-
-            f.write("\n")
+            f.write(buf.getvalue())
 
             # Use the standard report generation from base analyzer
             # Pass file handle to append to the same file instead of overwriting
@@ -416,17 +559,40 @@ class ChesscomGameAnalyzer:
 
         os.makedirs(output_dir, exist_ok=True)
 
+        # Ask once up front rather than from each fetch thread; with no name
+        # every thread would prompt on the same stdin at once
+        if not username:
+            username = input("Enter your Chess.com username: ").strip()
+            if not username:
+                print("Error: Username required")
+                return []
+
+        # Chess.com API requires lowercase usernames
+        username = username.lower()
+
+        # Fetching is network-bound, so download all games concurrently over
+        # the shared session, then run the engine analysis one game at a time
+        print(f"Fetching {len(game_urls)} games from Chess.com...")
+        # Parse each URL once; the (game_type, game_id) pair is reused by the
+        # fetch and the report
+        parsed_ids = [extract_game_id_from_url(game_url) for game_url in game_urls]
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+            pgn_texts = list(executor.map(
+                lambda game_url, parsed: self.fetch_game_pgn(game_url, username, *parsed),
+                game_urls, parsed_ids
+            ))
+
         results_list = []
 
-        for i, game_url in enumerate(game_urls, 1):
+        for i, (game_url, (game_type, game_id), pgn_text) in enumerate(
+                zip(game_urls, parsed_ids, pgn_texts), 1):
             print(f"\n{'='*70}")
             print(f"Analyzing game {i}/{len(game_urls)}: {game_url}")
             print(f"{'='*70}")
 
-            game_type, game_id = extract_game_id_from_url(game_url)
             output_file = os.path.join(output_dir, f"analysis_{game_id}.txt")
 
-            result = self.analyze_chesscom_game(game_url, username, output_file)
+            result = self._analyze_pgn(pgn_text, game_url, output_file, game_id)
             results_list.append(result)
 
             print(f"✓ Completed {i}/{len(game_urls)}")
@@ -443,58 +609,76 @@ class ChesscomGameAnalyzer:
 
         summary_file = os.path.join(output_dir, 'analysis_summary.txt')
 
+        buf = io.StringIO()
+        w = buf.write
+        w("="*70 + "\n")
+        w("MULTI-GAME ANALYSIS SUMMARY (CHESS.COM)\n")
+        w(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        w("="*70 + "\n\n")
+
+        w(f"Total games analyzed: {len(results_list)}\n\n")
+
+        # Aggregate statistics in a single pass over the results
+        totals = {
+            'blunders': 0,
+            'mistakes': 0,
+            'inaccuracies': 0,
+            'tactical_errors': 0,
+            'positional_errors': 0
+        }
+        successful_games = 0
+        for r in results_list:
+            if 'error' in r:
+                continue
+            successful_games += 1
+            for k in totals:
+                totals[k] += r.get(k, 0)
+
+        total_blunders = totals['blunders']
+        total_mistakes = totals['mistakes']
+        total_inaccuracies = totals['inaccuracies']
+        total_tactical = totals['tactical_errors']
+        total_positional = totals['positional_errors']
+
+        w("AGGREGATE STATISTICS\n")
+        w("-"*70 + "\n")
+        w(f"Successfully analyzed: {successful_games}/{len(results_list)}\n")
+        w(f"Total blunders: {total_blunders}\n")
+        w(f"Total mistakes: {total_mistakes}\n")
+        w(f"Total inaccuracies: {total_inaccuracies}\n")
+        w(f"Total tactical errors: {total_tactical}\n")
+        w(f"Total positional errors: {total_positional}\n\n")
+
+        if successful_games > 0:
+            # Average per game
+            avg_blunders = total_blunders / successful_games
+            avg_mistakes = total_mistakes / successful_games
+
+            w("AVERAGES PER GAME\n")
+            w("-"*70 + "\n")
+            w(f"Average blunders: {avg_blunders:.1f}\n")
+            w(f"Average mistakes: {avg_mistakes:.1f}\n")
+            w(f"Average inaccuracies: {total_inaccuracies/successful_games:.1f}\n\n")
+
+        # Individual game summary
+        w("INDIVIDUAL GAME SUMMARIES\n")
+        w("-"*70 + "\n\n")
+
+        for result in results_list:
+            if 'error' in result:
+                w(f"Game: ERROR - {result['error']}\n\n")
+                continue
+
+            game_info = result.get('game_info', {})
+            w(f"Game: {result['chesscom_url']}\n")
+            w(f"  {game_info.get('White', '?')} vs {game_info.get('Black', '?')}\n")
+            w(f"  Blunders: {result.get('blunders', 0)}, ")
+            w(f"Mistakes: {result.get('mistakes', 0)}, ")
+            w(f"Inaccuracies: {result.get('inaccuracies', 0)}\n\n")
+
+        # One write for the whole summary instead of one per line
         with open(summary_file, 'w', encoding='utf-8') as f:
-            f.write("="*70 + "\n")
-            f.write("MULTI-GAME ANALYSIS SUMMARY (CHESS.COM)\n")
-            f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("="*70 + "\n\n")
-
-            f.write(f"Total games analyzed: {len(results_list)}\n\n")
-
-            # Aggregate statistics
-            total_blunders = sum(r.get('blunders', 0) for r in results_list if 'error' not in r)
-            total_mistakes = sum(r.get('mistakes', 0) for r in results_list if 'error' not in r)
-            total_inaccuracies = sum(r.get('inaccuracies', 0) for r in results_list if 'error' not in r)
-            total_tactical = sum(r.get('tactical_errors', 0) for r in results_list if 'error' not in r)
-            total_positional = sum(r.get('positional_errors', 0) for r in results_list if 'error' not in r)
-
-            successful_games = len([r for r in results_list if 'error' not in r])
-
-            f.write("AGGREGATE STATISTICS\n")
-            f.write("-"*70 + "\n")
-            f.write(f"Successfully analyzed: {successful_games}/{len(results_list)}\n")
-            f.write(f"Total blunders: {total_blunders}\n")
-            f.write(f"Total mistakes: {total_mistakes}\n")
-            f.write(f"Total inaccuracies: {total_inaccuracies}\n")
-            f.write(f"Total tactical errors: {total_tactical}\n")
-            f.write(f"Total positional errors: {total_positional}\n\n")
-
-            if successful_games > 0:
-                # Average per game
-                avg_blunders = total_blunders / successful_games
-                avg_mistakes = total_mistakes / successful_games
-
-                f.write("AVERAGES PER GAME\n")
-                f.write("-"*70 + "\n")
-                f.write(f"Average blunders: {avg_blunders:.1f}\n")
-                f.write(f"Average mistakes: {avg_mistakes:.1f}\n")
-                f.write(f"Average inaccuracies: {total_inaccuracies/successful_games:.1f}\n\n")
-
-            # Individual game summary
-            f.write("INDIVIDUAL GAME SUMMARIES\n")
-            f.write("-"*70 + "\n\n")
-
-            for result in results_list:
-                if 'error' in result:
-                    f.write(f"Game: ERROR - {result['error']}\n\n")
-                    continue
-
-                game_info = result.get('game_info', {})
-                f.write(f"Game: {result['chesscom_url']}\n")
-                f.write(f"  {game_info.get('White', '?')} vs {game_info.get('Black', '?')}\n")
-                f.write(f"  Blunders: {result.get('blunders', 0)}, ")
-                f.write(f"Mistakes: {result.get('mistakes', 0)}, ")
-                f.write(f"Inaccuracies: {result.get('inaccuracies', 0)}\n\n")
+            f.write(buf.getvalue())
 
         # Show full path
         full_path = os.path.abspath(summary_file)
@@ -8,14 +8,21 @@ Usage:
 """
 
 import argparse
+import functools
 import chess
 import chess.pgn
 import chess.engine
+import chess.polyglot
 import io
 import os
 import sys
+import queue
 import re
+import shutil
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 
@@ -28,6 +35,19 @@ BLUNDER_THRESHOLD = -200  # Loss of 2+ pawns
 MISTAKE_THRESHOLD = -100  # Loss of 1+ pawn
 OPENING_MOVES = 8         # Skip minor errors in first N full moves
 
+# Auto-analysis runs one single-threaded Stockfish per core: for MultiPV=1
+# evaluations several narrow engines beat one engine with many threads
+ENGINE_POOL_SIZE = max(1, min(8, os.cpu_count() or 1))
+ENGINE_OPTIONS = {"Threads": 1, "Hash": 128}
+
+# Only the score and PV are used; the default INFO_ALL also makes
+# python-chess parse refutation, currline, hashfull etc. from every info line
+ANALYSIS_INFO = chess.engine.INFO_SCORE | chess.engine.INFO_PV
+
+# Transposition table of engine results for this run:
+# (zobrist hash, multipv) -> (depth, info)
+_ANALYSIS_CACHE = {}
+
 
 # ============================================================================
 # Chess.com Fetching (from chess_grab_five_games.py)
@@ -36,14 +56,51 @@ OPENING_MOVES = 8         # Skip minor errors in first N full moves
 DEFAULT_USERNAME = 'tttstanley'
 DEFAULT_NUM_GAMES = 5
 
+_ANY_HEADER_RE = re.compile(r'\[(\w+) "([^"]+)"\]')
+
+# Headers kept by clean_pgn_for_output
+ESSENTIAL_HEADERS = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result',
+                     'WhiteElo', 'BlackElo', 'ECO', 'Opening', 'TimeControl')
+# Line prefixes for str.startswith, which tries them all in one C call
+_ESSENTIAL_PREFIXES = tuple(f'[{h} ' for h in ESSENTIAL_HEADERS)
+
+# Patterns compiled once at import
+_CLK_RE = re.compile(r'\s*\{\s*\[%clk[^\]]*\]\s*\}\s*')
+_SPACES_RE = re.compile(r' +')
+_NL_SPACE_RE = re.compile(r'\n +')
+_MOVE_LOC_RE = re.compile(r'^(\d+)(\.{1,3})$')
+
+# Shared keep-alive session so the monthly archive requests reuse connections
+SESSION = requests.Session()
+SESSION.headers.update({
+    'User-Agent': 'Chess Analysis Tool (Python/requests)',
+    'Accept': 'application/json'
+})
+SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=20))
+
+# Chess.com answers 429 when throttling; retry those requests, waiting for
+# Retry-After when given and backing off exponentially otherwise
+MAX_RETRIES = 4
+MAX_RETRY_DELAY = 30
+
+
+def _get(url, max_retries=MAX_RETRIES):
+    """GET a URL over the shared session, retrying rate-limited (429) responses"""
+    for attempt in range(max_retries + 1):
+        response = SESSION.get(url, timeout=10)
+        if response.status_code != 429 or attempt == max_retries:
+            return response
+        try:
+            delay = float(response.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            delay = 2 ** attempt
+        response.close()
+        print(f"  Rate limited by Chess.com, retrying in {delay:g}s...")
+        time.sleep(min(MAX_RETRY_DELAY, max(0.0, delay)))
+
 
 def fetch_games_from_chesscom(username, num_games=5):
     """Fetch last N games from Chess.com API"""
-    headers = {
-        'User-Agent': 'Chess Analysis Tool (Python/requests)',
-        'Accept': 'application/json'
-    }
-
     games_list = []
     now = datetime.now()
     year = now.year
@@ -55,7 +112,7 @@ def fetch_games_from_chesscom(username, num_games=5):
     archive_url = f"https://api.chess.com/pub/player/{username.lower()}/games/{year}/{str(month).zfill(2)}"
 
     try:
-        response = requests.get(archive_url, headers=headers, timeout=10)
+        response = _get(archive_url)
         if response.ok:
             data = response.json()
             if 'games' in data:
@@ -75,7 +132,7 @@ def fetch_games_from_chesscom(username, num_games=5):
         prev_url = f"https://api.chess.com/pub/player/{username.lower()}/games/{prev_year}/{str(prev_month).zfill(2)}"
 
         try:
-            response = requests.get(prev_url, headers=headers, timeout=10)
+            response = _get(prev_url)
             if response.ok:
                 data = response.json()
                 if 'games' in data:
@@ -89,25 +146,28 @@ def fetch_games_from_chesscom(username, num_games=5):
     return games_list[:num_games]
 
 
-def extract_header(pgn_text, header_name):
-    """Extract a header value from PGN"""
-    pattern = rf'\[{header_name} "([^"]+)"\]'
-    match = re.search(pattern, pgn_text)
-    return match.group(1) if match else None
+def extract_headers(pgn_text):
+    """Extract all PGN headers in one pass over the header block"""
+    headers = {}
+    # Headers come before the first blank line; scan only that block
+    header_block = pgn_text.lstrip().split('\n\n', 1)[0]
+    for name, value in _ANY_HEADER_RE.findall(header_block):
+        headers.setdefault(name, value)
+    return headers
 
 
-def get_game_summary(pgn_text, username):
-    """Get a one-line summary of a game"""
-    white = extract_header(pgn_text, 'White') or '?'
-    black = extract_header(pgn_text, 'Black') or '?'
-    result = extract_header(pgn_text, 'Result') or '?'
-    date = extract_header(pgn_text, 'Date') or '?'
-    eco = extract_header(pgn_text, 'ECO') or ''
-    opening = extract_header(pgn_text, 'Opening') or ''
-    time_control = extract_header(pgn_text, 'TimeControl') or ''
+def get_game_summary(pgn_text, username_lower):
+    """Get a one-line summary of a game (username_lower must already be lowercased)"""
+    headers = extract_headers(pgn_text)
+    white = headers.get('White') or '?'
+    black = headers.get('Black') or '?'
+    result = headers.get('Result') or '?'
+    date = headers.get('Date') or '?'
+    eco = headers.get('ECO') or ''
+    opening = headers.get('Opening') or ''
+    time_control = headers.get('TimeControl') or ''
 
     # Determine if user won/lost/drew
-    username_lower = username.lower()
     if white.lower() == username_lower:
         color = 'W'
         outcome = 'Win' if result == '1-0' else ('Loss' if result == '0-1' else 'Draw')
@@ -127,35 +187,46 @@ def get_game_summary(pgn_text, username):
 # Stockfish Analysis (from stockfish_add_variation.py)
 # ============================================================================
 
+@functools.lru_cache(maxsize=1)
 def find_stockfish():
-    """Find Stockfish executable in common locations"""
-    common_paths = [
+    """Find Stockfish executable on PATH or in common locations"""
+    found = shutil.which("stockfish")
+    if found:
+        return found
+
+    common_paths = (
         "/usr/local/bin/stockfish",
         "/usr/bin/stockfish",
         "/opt/homebrew/bin/stockfish",
         os.path.expanduser("~/stockfish/stockfish"),
         os.path.expanduser("~/bin/stockfish"),
-        "stockfish",
-    ]
+    )
 
     for path in common_paths:
         if os.path.isfile(path) and os.access(path, os.X_OK):
             return path
-        if path == "stockfish":
-            try:
-                import shutil
-                found = shutil.which("stockfish")
-                if found:
-                    return found
-            except:
-                pass
     return None
 
 
+def start_engines(stockfish_path, count=1):
+    """Start count Stockfish processes configured with ENGINE_OPTIONS."""
+    engines = []
+    try:
+        for _ in range(count):
+            engine = chess.engine.SimpleEngine.popen_uci(stockfish_path)
+            engines.append(engine)
+            engine.configure(ENGINE_OPTIONS)
+    except Exception:
+        for engine in engines:
+            engine.quit()
+        raise
+    return engines
+
+
 def parse_move_location(move_str):
     """Parse move location string like '12.' or '12...'"""
     move_str = move_str.strip()
-    match = re.match(r'^(\d+)(\.{1,3})$', move_str)
+    match = _MOVE_LOC_RE.match(move_str)
     if not match:
         raise ValueError(f"Invalid format: '{move_str}'. Use '12.' for White or '12...' for Black")
 
@@ -166,37 +237,61 @@ def parse_move_location(move_str):
     return move_number, is_black_move
 
 
-def get_position_at_move(game, move_number, is_black_move):
-    """Get the board position BEFORE the specified move is played."""
+def build_plies(game):
+    """
+    Walk the mainline once, pairing each move's node with the board before it.
+
+    Returns:
+        list of (node, board) indexed by ply; boards are copied without
+        their move stacks
+    """
+    plies = []
     board = game.board()
     node = game
+    while node.variations:
+        next_node = node.variation(0)
+        plies.append((next_node, board.copy(stack=False)))
+        board.push(next_node.move)
+        node = next_node
+    return plies
 
+
+def get_position_at_move(plies, move_number, is_black_move):
+    """Get the board position BEFORE the specified move is played."""
     target_ply = (move_number - 1) * 2
     if is_black_move:
         target_ply += 1
 
-    current_ply = 0
+    if not 0 <= target_ply < len(plies):
+        raise ValueError(f"Move {move_number}{'...' if is_black_move else '.'} not found in game")
 
-    while node.variations:
-        next_node = node.variation(0)
+    next_node, board = plies[target_ply]
+    return board, next_node
 
-        if current_ply == target_ply:
-            return board, next_node
 
-        board.push(next_node.move)
-        node = next_node
-        current_ply += 1
+def cached_analyse(engine, board, depth, multipv=None):
+    """
+    engine.analyse with a transposition table keyed by Zobrist hash.
 
-    raise ValueError(f"Move {move_number}{'...' if is_black_move else '.'} not found in game")
+    Repeated positions reuse an earlier result searched at least as deep.
+    """
+    key = (chess.polyglot.zobrist_hash(board), multipv)
+    cached = _ANALYSIS_CACHE.get(key)
+    if cached is not None and cached[0] >= depth:
+        return cached[1]
+
+    limit = chess.engine.Limit(depth=depth)
+    if multipv is None:
+        info = engine.analyse(board, limit, info=ANALYSIS_INFO)
+    else:
+        info = engine.analyse(board, limit, multipv=multipv, info=ANALYSIS_INFO)
+    _ANALYSIS_CACHE[key] = (depth, info)
+    return info
 
 
 def analyze_position(board, engine, num_lines=3, depth=18):
     """Analyze position with Stockfish and return top moves."""
-    info_list = engine.analyse(
-        board,
-        chess.engine.Limit(depth=depth),
-        multipv=num_lines
-    )
+    info_list = cached_analyse(engine, board, depth, multipv=num_lines)
 
     results = []
     for info in info_list:
@@ -218,6 +313,8 @@ def analyze_position(board, engine, num_lines=3, depth=18):
             results.append({
                 'move': move,
                 'score': score_str,
+                # White's point of view in centipawns, mates as +/-10000
+                'score_cp': score.white().score(mate_score=10000) if score else 0,
                 'pv': pv,
                 'san': board.san(move)
             })
@@ -227,14 +324,15 @@ def analyze_position(board, engine, num_lines=3, depth=18):
 
 def format_variation_line(board, pv, move_number, is_black_move):
     """Format a variation line as PGN."""
-    temp_board = board.copy()
+    temp_board = board.copy(stack=False)
     parts = []
 
     for i, move in enumerate(pv):
         current_move_num = move_number + (i + (1 if is_black_move else 0)) // 2
         is_black = (i + (1 if is_black_move else 0)) % 2 == 1
 
-        san = temp_board.san(move)
+        # SAN and push in one call
+        san = temp_board.san_and_push(move)
 
         if i == 0:
             if is_black_move:
@@ -246,8 +344,6 @@ def format_variation_line(board, pv, move_number, is_black_move):
         else:
             parts.append(san)
 
-        temp_board.push(move)
-
     return ' '.join(parts)
 
 
@@ -266,35 +362,32 @@ def clean_pgn_for_output(pgn_text):
     Clean PGN for final output - remove clock annotations and non-essential headers.
     """
     # Remove clock annotations { [%clk 0:04:59.8] } (note: spaces inside braces)
-    cleaned = re.sub(r'\s*\{\s*\[%clk[^\]]*\]\s*\}\s*', ' ', pgn_text)
+    cleaned = _CLK_RE.sub(' ', pgn_text)
 
     # Remove excessive whitespace
-    cleaned = re.sub(r' +', ' ', cleaned)
-    cleaned = re.sub(r'\n +', '\n', cleaned)
+    cleaned = _SPACES_RE.sub(' ', cleaned)
+    cleaned = _NL_SPACE_RE.sub('\n', cleaned)
 
     # Remove non-essential headers (keep core ones)
-    essential_headers = ['Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result',
-                         'WhiteElo', 'BlackElo', 'ECO', 'Opening', 'TimeControl']
-
-    lines = cleaned.split('\n')
-    output_lines = []
+    # Write kept lines straight to a buffer instead of collecting a list
+    buf = io.StringIO()
     in_headers = True
 
-    for line in lines:
+    for line in cleaned.splitlines():
         if line.startswith('['):
             # Check if it's an essential header
-            for header in essential_headers:
-                if line.startswith(f'[{header} '):
-                    output_lines.append(line)
-                    break
+            if line.startswith(_ESSENTIAL_PREFIXES):
+                buf.write(line)
+                buf.write('\n')
         else:
             if in_headers and line.strip() == '':
                 in_headers = False
-                output_lines.append('')  # Keep one blank line after headers
+                buf.write('\n')  # Keep one blank line after headers
             elif not in_headers:
-                output_lines.append(line)
+                buf.write(line)
+                buf.write('\n')
 
-    return '\n'.join(output_lines).strip()
+    return buf.getvalue().strip()
 
 
 def classify_move(eval_before_cp, eval_after_cp, move_number, is_black_move):
@@ -328,6 +421,29 @@ def classify_move(eval_before_cp, eval_after_cp, move_number, is_black_move):
     return None, 0
 
 
+def classify_moves(evals_before, evals_after, move_numbers):
+    """
+    Classify a whole game's moves at once (see classify_move).
+
+    Args:
+        evals_before: Evaluations before each move (centipawns, moving side's perspective)
+        evals_after: Evaluations after each move (centipawns, moving side's perspective)
+        move_numbers: Full move number of each move
+
+    Returns:
+        list of (index, classification, loss_in_pawns) for the flagged moves only
+    """
+    flagged = []
+    for i, (before, after, move_number) in enumerate(zip(evals_before, evals_after, move_numbers)):
+        # Most moves lose less than a mistake's worth; skip them cheaply
+        if after - before > MISTAKE_THRESHOLD:
+            continue
+        classification, loss = classify_move(before, after, move_number, False)
+        if classification:
+            flagged.append((i, classification, loss))
+    return flagged
+
+
 def add_variation_at_move(game, board, target_node, alt_moves, move_number, is_black_move):
     """Add Stockfish variations to the game tree."""
     parent_node = target_node.parent
@@ -337,12 +453,13 @@ def add_variation_at_move(game, board, target_node, alt_moves, move_number, is_b
         var_node = parent_node.add_variation(alt['move'])
         var_node.comment = f"Stockfish: {alt['score']}"
 
-        temp_board = board.copy()
+        temp_board = board.copy(stack=False)
         temp_board.push(alt['move'])
         current_var_node = var_node
 
         for continuation_move in alt['pv'][1:]:
-            if continuation_move in temp_board.legal_moves:
+            # is_legal checks this one move instead of generating every legal move
+            if temp_board.is_legal(continuation_move):
                 current_var_node = current_var_node.add_variation(continuation_move)
                 temp_board.push(continuation_move)
 
@@ -351,84 +468,105 @@ def add_variation_at_move(game, board, target_node, alt_moves, move_number, is_b
     return variations_added
 
 
-def count_moves(game):
+def count_moves(plies):
     """Count total moves in the main line."""
-    count = 0
-    node = game
-    while node.variations:
-        node = node.variation(0)
-        count += 1
-    return count
+    return len(plies)
 
 
-def auto_analyze_game(game, engine, depth=18):
+def evaluate_positions(boards, engines, depth=18):
     """
-    Automatically analyze all moves and return blunders/mistakes.
+    Analyse every board once, spreading the work over the engine pool.
 
     Returns:
-        list of dicts with move info and classification
+        list of engine info dicts, in the same order as boards
     """
-    board = game.board()
-    errors = []
+    idle = queue.Queue()
+    for engine in engines:
+        idle.put(engine)
 
-    print("\nAnalyzing all moves...")
+    def analyse(board):
+        # Check out an idle engine for this position and hand it back after
+        engine = idle.get()
+        try:
+            return cached_analyse(engine, board, depth)
+        finally:
+            idle.put(engine)
 
-    for node in game.mainline():
-        move = node.move
-        moving_side = board.turn
+    # Repeated positions are analysed once, not once per occurrence
+    keys = [chess.polyglot.zobrist_hash(board) for board in boards]
+    unique = dict(zip(keys, boards))
 
-        # Calculate move number and notation
-        ply = board.ply()
-        full_move_num = (ply // 2) + 1
-        is_black = (ply % 2 == 1)
+    with ThreadPoolExecutor(max_workers=len(engines)) as executor:
+        results = dict(zip(unique, executor.map(analyse, unique.values())))
+    return [results[key] for key in keys]
 
-        # Get eval and best move BEFORE the move is made
-        info_before = engine.analyse(board, chess.engine.Limit(depth=depth))
-        eval_before = info_before['score'].white().score(mate_score=10000)
-        best_move_uci = info_before.get('pv', [None])[0]
 
-        # Get best move in SAN notation while board is still in pre-move state
-        best_san = board.san(best_move_uci) if best_move_uci else '?'
+def auto_analyze_game(game, engines, depth=18):
+    """
+    Automatically analyze all moves and return blunders/mistakes.
 
-        # Make move
-        san = board.san(move)
-        board.push(move)
+    Args:
+        engines: list of engines (see start_engines) to analyse positions on
 
-        # Get eval after move
-        info_after = engine.analyse(board, chess.engine.Limit(depth=depth))
-        eval_after = info_after['score'].white().score(mate_score=10000)
+    Returns:
+        list of dicts with move info and classification
+    """
+    errors = []
 
-        # Flip for Black's perspective
-        if moving_side == chess.BLACK:
-            eval_before_perspective = -eval_before
-            eval_after_perspective = -eval_after
-        else:
-            eval_before_perspective = eval_before
-            eval_after_perspective = eval_after
+    print("\nAnalyzing all moves...")
 
-        # Classify
-        classification, loss = classify_move(
-            eval_before_perspective, eval_after_perspective,
-            full_move_num, is_black
-        )
+    # Walk the mainline once, keeping the position before every move and
+    # the final position. The position after ply i is the one before ply
+    # i + 1, so each is analysed once instead of twice
+    board = game.board()
+    boards = [board.copy(stack=False)]
+    moves = []
+    for node in game.mainline():
+        moves.append(node.move)
+        board.push(node.move)
+        boards.append(board.copy(stack=False))
+
+    infos = evaluate_positions(boards, engines, depth)
+
+    # Evals from the moving side's perspective, before and after each move
+    evals = [info['score'].white().score(mate_score=10000) for info in infos]
+    evals_before = []
+    evals_after = []
+    move_numbers = []
+    for ply in range(len(moves)):
+        sign = -1 if boards[ply].turn == chess.BLACK else 1
+        evals_before.append(sign * evals[ply])
+        evals_after.append(sign * evals[ply + 1])
+        move_numbers.append(boards[ply].fullmove_number)
+
+    # Classify the whole game in one pass; SAN is only needed for flagged moves
+    for ply, classification, loss in classify_moves(evals_before, evals_after, move_numbers):
+        board = boards[ply]
+        full_move_num = move_numbers[ply]
+        is_black = board.turn == chess.BLACK
+        eval_before_perspective = evals_before[ply]
+        eval_after_perspective = evals_after[ply]
+
+        best_move_uci = infos[ply].get('pv', [None])[0]
+        best_san = board.san(best_move_uci) if best_move_uci else '?'
+        san = board.san(moves[ply])
 
-        if classification:
-            move_notation = f"{full_move_num}{'...' if is_black else '.'}"
-
-            errors.append({
-                'notation': move_notation,
-                'played': san,
-                'classification': classification,
-                'loss': loss,
-                'eval_before': eval_before_perspective / 100,
-                'eval_after': eval_after_perspective / 100,
-                'best_move': best_san
-            })
+        move_notation = f"{full_move_num}{'...' if is_black else '.'}"
+
+        errors.append({
+            'notation': move_notation,
+            'played': san,
+            'classification': classification,
+            'loss': loss,
+            'eval_before': eval_before_perspective / 100,
+            'eval_after': eval_after_perspective / 100,
+            'best_move': best_san
+        })
 
-            color = '\033[91m' if classification == 'BLUNDER' else '\033[93m'
-            reset = '\033[0m'
-            print(f"  {color}{move_notation} {san} - {classification} (lost {loss:.2f} pawns){reset}")
-            print(f"    Stockfish best: {best_san} [{eval_before_perspective/100:+.2f}]")
+        color = '\033[91m' if classification == 'BLUNDER' else '\033[93m'
+        reset = '\033[0m'
+        print(f"  {color}{move_notation} {san} - {classification} (lost {loss:.2f} pawns){reset}")
+        print(f"    Stockfish best: {best_san} [{eval_before_perspective/100:+.2f}]")
 
     return errors
 
@@ -473,9 +611,10 @@ def main():
 
     # Display game list
     valid_games = []
+    username_lower = args.user.lower()
     for i, game in enumerate(games):
         if 'pgn' in game:
-            summary = get_game_summary(game['pgn'], args.user)
+            summary = get_game_summary(game['pgn'], username_lower)
             print(f"  {i + 1}. {summary}")
             valid_games.append(game)
         else:
@@ -500,16 +639,17 @@ def main():
     selected_game = valid_games[game_idx]
     pgn_text = selected_game['pgn']
 
-    # Clean and parse PGN
-    clean_pgn = clean_pgn_for_parsing(pgn_text)
-    pgn_io = io.StringIO(clean_pgn)
+    # Clean and parse PGN once; variations are added to this tree in place
+    pgn_io = io.StringIO(clean_pgn_for_parsing(pgn_text))
     game = chess.pgn.read_game(pgn_io)
 
     if not game:
         print("Error parsing PGN!")
         sys.exit(1)
 
-    total_moves = count_moves(game)
+    # Index the mainline once so move lookups don't re-walk the game
+    plies = build_plies(game)
+    total_moves = count_moves(plies)
     total_move_numbers = (total_moves + 1) // 2
 
     print(f"\nGame loaded: {total_moves} half-moves ({total_move_numbers} full moves)")
@@ -522,9 +662,11 @@ def main():
     print(moves_only[:500] + ('...' if len(moves_only) > 500 else ''))
     print()
 
-    # Start Stockfish engine
-    print("Starting Stockfish...")
-    engine = chess.engine.SimpleEngine.popen_uci(stockfish_path)
+    # Start Stockfish: a pool for auto-analysis, a single engine interactively
+    pool_size = ENGINE_POOL_SIZE if args.auto else 1
+    print(f"Starting Stockfish{f' ({pool_size} engines)' if pool_size > 1 else ''}...")
+    engines = start_engines(stockfish_path, pool_size)
+    engine = engines[0]
 
     try:
         # Auto-analyze mode
@@ -533,11 +675,7 @@ def main():
             print("AUTO-ANALYSIS MODE")
             print("=" * 60)
 
-            # Re-parse game
-            pgn_io = io.StringIO(clean_pgn)
-            game = chess.pgn.read_game(pgn_io)
-
-            errors = auto_analyze_game(game, engine, args.depth)
+            errors = auto_analyze_game(game, engines, args.depth)
 
             # Summary
             print("\n" + "=" * 60)
@@ -554,7 +692,7 @@ def main():
                     print(f"  {color}{e['notation']} {e['played']}{reset} - {e['classification']} "
                           f"(lost {e['loss']:.2f} pawns, best: {e['best_move']})")
 
-            return  # finally block will quit engine
+            return  # finally block will quit the engines
 
         # Interactive loop for adding variations
         while True:
@@ -567,37 +705,27 @@ def main():
             try:
                 move_number, is_black_move = parse_move_location(move_input)
 
-                # Re-parse game to get fresh tree (in case we've modified it)
-                pgn_io = io.StringIO(clean_pgn)
-                game = chess.pgn.read_game(pgn_io)
-
-                board, target_node = get_position_at_move(game, move_number, is_black_move)
+                board, target_node = get_position_at_move(plies, move_number, is_black_move)
                 played_san = board.san(target_node.move)
 
                 print(f"\nAnalyzing position before {move_number}{'...' if is_black_move else '.'} {played_san}")
                 print(f"Depth: {args.depth}")
 
-                # Analyze - fetch extra line in case played move is best
-                alternatives = analyze_position(board, engine, args.lines + 1, args.depth)
+                # Analyze only the requested lines: extra MultiPV lines weaken the
+                # main search, and a played move among them is filtered out below
+                alternatives = analyze_position(board, engine, args.lines, args.depth)
 
                 # Get eval before (from first alternative)
-                eval_before_str = alternatives[0]['score']
-                try:
-                    if eval_before_str.startswith('#'):
-                        eval_before_cp = 10000 if '+' in eval_before_str else -10000
-                    else:
-                        eval_before_cp = int(float(eval_before_str) * 100)
-                except:
-                    eval_before_cp = 0
+                eval_before_cp = alternatives[0]['score_cp']
 
                 # Get eval after played move
-                board_after = board.copy()
+                board_after = board.copy(stack=False)
                 board_after.push(target_node.move)
-                info_after = engine.analyse(board_after, chess.engine.Limit(depth=args.depth))
+                info_after = cached_analyse(engine, board_after, args.depth)
                 eval_after_cp = info_after['score'].white().score(mate_score=10000)
 
                 # Flip for black's perspective
-                if is_black_move:
+                if board.turn == chess.BLACK:
                     eval_before_perspective = -eval_before_cp
                     eval_after_perspective = -eval_after_cp
                 else:
@@ -628,10 +756,6 @@ def main():
 
                 if added > 0:
                     print(f"\nAdded {added} variation(s)")
-
-                    # Update clean_pgn with new variations
-                    exporter = chess.pgn.StringExporter(headers=True, variations=True, comments=True)
-                    clean_pgn = game.accept(exporter)
                 else:
                     print("\nPlayed move was the best - no variations added")
 
@@ -641,16 +765,15 @@ def main():
                 print(f"Error: {e}")
 
     finally:
-        engine.quit()
+        for pool_engine in engines:
+            pool_engine.quit()
 
     # Final output
     print("\n" + "=" * 60)
     print("FINAL PGN WITH VARIATIONS:")
     print("=" * 60 + "\n")
 
-    # Re-parse and export final PGN
-    pgn_io = io.StringIO(clean_pgn)
-    game = chess.pgn.read_game(pgn_io)
+    # Export the game tree with all added variations
     exporter = chess.pgn.StringExporter(headers=True, variations=True, comments=True)
     final_pgn = game.accept(exporter)
 
@@ -17,6 +17,7 @@ Output:
 import os
 import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 
 def process_file(file_path):
     """Read a file and return its content."""
@@ -38,43 +39,54 @@ def generate_preloaded_reports(input_dir='./preloaded_reports', output_dir='./pr
         print(f"Error: Input directory '{input_dir}' does not exist.")
         return
 
-    files_data = {}
     file_list = []
 
-    # Get all files in the directory
-    entries = os.listdir(input_dir)
-
-    # Filter for .txt and .md files (not directories)
-    text_files = [f for f in entries
-                  if os.path.isfile(os.path.join(input_dir, f))
-                  and (f.endswith('.txt') or f.endswith('.md'))
-                  and not f.startswith('.')]
+    # Filter for .txt and .md files (not directories); scandir entries know
+    # their type from the directory read, so no extra stat per file
+    with os.scandir(input_dir) as it:
+        text_files = [entry.name for entry in it
+                      if entry.is_file()
+                      and (entry.name.endswith('.txt') or entry.name.endswith('.md'))
+                      and not entry.name.startswith('.')]
 
     # Sort files naturally (handles numbers correctly)
     text_files.sort(key=lambda x: x.lower())
 
     print(f"Found {len(text_files)} report files in {input_dir}")
 
-    for filename in text_files:
-        file_path = os.path.join(input_dir, filename)
-        content = process_file(file_path)
-
-        if content is not None:
-            files_data[filename] = content
-            file_list.append({
-                'name': filename,
-                'size': len(content)
-            })
-            print(f"  - {filename} ({len(content):,} chars)")
+    # Write reports.json one entry at a time as each file is read, rather than
+    # holding every report in a dict. Compact separators: the file is only
+    # read by the app. Written to a temp file so a failed run leaves the
+    # previous reports.json in place. Reads are I/O-bound, so overlap them
+    # on a thread pool; map() still yields the contents in sorted order
+    reports_path = os.path.join(output_dir, 'reports.json')
+    tmp_path = reports_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f, \
+            ThreadPoolExecutor(max_workers=max(1, min(32, len(text_files)))) as executor:
+        f.write('{')
+        contents = executor.map(
+            process_file, [os.path.join(input_dir, name) for name in text_files])
+        for filename, content in zip(text_files, contents):
+            if content is not None:
+                if file_list:
+                    f.write(',')
+                f.write(json.dumps(filename, ensure_ascii=False))
+                f.write(':')
+                f.write(json.dumps(content, ensure_ascii=False))
+                file_list.append({
+                    'name': filename,
+                    'size': len(content)
+                })
+                print(f"  - {filename} ({len(content):,} chars)")
+        f.write('}')
 
     if len(file_list) == 0:
+        os.remove(tmp_path)
         print("No .txt or .md files found.")
         return
 
-    # Save all reports to a single JSON file
-    reports_path = os.path.join(output_dir, 'reports.json')
-    with open(reports_path, 'w', encoding='utf-8') as f:
-        json.dump(files_data, f, ensure_ascii=False, indent=2)
+    # Replace the previous reports.json with the finished file
+    os.replace(tmp_path, reports_path)
     print(f"\nSaved reports to {reports_path}")
 
     # Save index of all files
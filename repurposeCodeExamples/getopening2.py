@@ -1,7 +1,10 @@
 import requests
 import chess
 import chess.pgn
+import chess.polyglot
+import os
 from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
 
 # Your PGN
 pgn = """1. d4 d5 2. c4 Nc6 3. cxd5 Qxd5 4. Nc3 Qa5 5. Nf3 e6 6. Bd2 Qb6 7. b3 Bb4 8. e3 Nf6 9. a3 Bd6 10. b4 a5 11. b5 Na7 12. Be2 Nxb5 13. Bxb5+ c6 14. Be2 O-O 15. O-O c5 16. dxc5 Qxc5 17. Na4 Qc6 18. Nd4 Qe8 19. Nb6 Bd7 20. Nxa8 Ba4 21. Qc1 Qxa8 22. Bb5 Rc8 23. Qb2 Bxb5 24. Qxb5 Rc5 25. Qxb7 Qxb7 26. Rfb1 Qd5 27. Rb8+ Bxb8"""
@@ -9,47 +12,128 @@ pgn = """1. d4 d5 2. c4 Nc6 3. cxd5 Qxd5 4. Nc3 Qa5 5. Nf3 e6 6. Bd2 Qb6 7. b3 B
 # Parse PGN
 game = chess.pgn.read_game(StringIO(pgn))
 
+MAX_PLIES = 49
+LOOKUP_WORKERS = 8
+
+# Directory with the lichess-org/chess-openings TSV files (a.tsv ... e.tsv).
+# When present, openings are looked up locally instead of over the network
+OPENINGS_DIR = os.environ.get(
+    'CHESS_OPENINGS_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chess-openings'))
+
+# One keep-alive session so the lookups reuse the TCP+TLS connection
+session = requests.Session()
+
+# Opening (or None) already looked up, keyed by FEN
+opening_cache = {}
+
+
+def load_opening_book(directory):
+    """Map Zobrist hash -> {'eco', 'name'} from chess-openings TSV files (empty if absent)"""
+    book = {}
+    if not os.path.isdir(directory):
+        return book
+
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.tsv'):
+            continue
+        with open(os.path.join(directory, filename), encoding='utf-8') as f:
+            next(f, None)  # eco, name, pgn header
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) < 3:
+                    continue
+                eco, name, moves = fields[:3]
+                board = chess.Board()
+                try:
+                    for token in moves.split():
+                        if not token[0].isdigit():  # skip move numbers
+                            board.push_san(token)
+                except ValueError:
+                    continue
+                book[chess.polyglot.zobrist_hash(board)] = {'eco': eco, 'name': name}
+    return book
+
+
+def lookup_opening(fen):
+    """Return the Lichess masters opening for a FEN, or None past known theory"""
+    if fen not in opening_cache:
+        try:
+            response = session.get("https://explorer.lichess.ovh/masters",
+                                   params={'fen': fen}, timeout=10)
+            data = response.json()
+            opening_cache[fen] = data.get('opening') if data else None
+        except Exception:
+            # API error - treat as the end of known theory
+            opening_cache[fen] = None
+    return opening_cache[fen]
+
+
+# FEN and Zobrist hash after each ply, from one pass over the mainline
+fens = []
+keys = []
+test_board = game.board()
+for move in list(game.mainline_moves())[:MAX_PLIES]:
+    test_board.push(move)
+    fens.append(test_board.fen())
+    keys.append(chess.polyglot.zobrist_hash(test_board))
+
+opening_book = load_opening_book(OPENINGS_DIR)
+
+if opening_book:
+    # Local lookups are microseconds, so just scan to the first unnamed ply
+    openings = []
+    for key in keys:
+        opening = opening_book.get(key)
+        if not opening:
+            break
+        openings.append(opening)
+    theory_end = len(openings)
+else:
+    # Binary search for a ply that still has an opening: O(log n) requests
+    # instead of one per ply. Named plies needn't be a contiguous prefix,
+    # so this can land past an unnamed one; the cut below fixes that
+    low, high = 0, len(fens)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if lookup_opening(fens[mid - 1]):
+            low = mid
+        else:
+            high = mid - 1
+    theory_end = low
+
+    # Fetch the openings up to that ply in parallel to report where the name
+    # changes; the plies probed by the search are already cached
+    with ThreadPoolExecutor(max_workers=LOOKUP_WORKERS) as executor:
+        openings = list(executor.map(lookup_opening, fens[:theory_end]))
+
+    # Theory ends at the first unnamed ply, same as a ply-by-ply scan (and
+    # the book path above)
+    if None in openings:
+        theory_end = openings.index(None)
+        del openings[theory_end:]
+
 last_opening_name = None
 last_opening_eco = None
 
-# Try different move depths to find opening
-for num_moves in range(1, 50):
-    test_board = game.board()
-    moves = list(game.mainline_moves())[:num_moves]
-    
-    if not moves or num_moves > len(list(game.mainline_moves())):
-        break
-    
-    for move in moves:
-        test_board.push(move)
-    
-    fen = test_board.fen()
-    response = requests.get(f"https://explorer.lichess.ovh/masters?fen={fen}")
-    
-    try:
-        data = response.json()
-        if data and 'opening' in data and data['opening']:
-            current_name = data['opening']['name']
-            current_eco = data['opening']['eco']
-            
-            # Only print if opening name changed
-            if current_name != last_opening_name:
-                print(f"After {num_moves} move(s):")
-                print(f"  Opening: {current_name}")
-                print(f"  ECO: {current_eco}")
-                print()
-                
-                last_opening_name = current_name
-                last_opening_eco = current_eco
-        else:
-            # No opening data returned - we've gone beyond known opening theory
-            print(f"✓ Opening theory ends after move {num_moves - 1}")
-            print(f"  Final Opening: {last_opening_name}")
-            print(f"  ECO: {last_opening_eco}")
-            break
-    except:
-        # API error - stop here
-        print(f"✓ Opening theory ends after move {num_moves - 1}")
-        print(f"  Final Opening: {last_opening_name}")
-        print(f"  ECO: {last_opening_eco}")
-        break
+for num_moves, opening in enumerate(openings, 1):
+    if not opening:
+        continue
+    current_name = opening['name']
+    current_eco = opening['eco']
+
+    # Only print if opening name changed
+    if current_name != last_opening_name:
+        print(f"After {num_moves} move(s):")
+        print(f"  Opening: {current_name}")
+        print(f"  ECO: {current_eco}")
+        print()
+
+        last_opening_name = current_name
+        last_opening_eco = current_eco
+
+if theory_end < len(fens):
+    # No opening data for the next ply - we've gone beyond known opening theory
+    print(f"✓ Opening theory ends after move {theory_end}")
+    print(f"  Final Opening: {last_opening_name}")
+    print(f"  ECO: {last_opening_eco}")
@@ -6,11 +6,35 @@ or mistake (? or $2) is detected.
 Usage:
     python sort_pgn_by_annotation.py piano_game.txt
     python sort_pgn_by_annotation.py piano_game.txt > sorted.txt
+    python sort_pgn_by_annotation.py --pgn games.pgn > sorted.pgn
 """
 
 import re
 import sys
 
+import chess
+import chess.pgn
+
+# Sentinel for "no annotation found"
+INF = float('inf')
+
+# Patterns compiled once at import
+_COMMENT_RE = re.compile(r'\{[^}]*\}')
+_VAR_RE = re.compile(r'\([^)]*\)')
+# One pass over a cleaned line, matching what a whitespace tokenizer would see:
+#   mv     - move number at the start of a token ("12.", "12..."), optionally
+#            followed in the same token by a NAG (mvnag)
+#   nag    - a whole-token NAG, $6 (inaccuracy) or $2 (mistake)
+#   inacc  - ?! not preceded by !
+#   mist   - a single ? (not part of ?! or ??)
+_SCAN_RE = re.compile(r"""
+    (?<!\S)(?P<mv>\d+)\.+(?:\$(?P<mvnag>[26])(?!\S))?
+  | (?<!\S)\$(?P<nag>[26])(?!\S)
+  | (?P<inacc>(?<!!)\?!)
+  | (?P<mist>(?<!\?)\?(?![!?]))
+""", re.VERBOSE)
+_HAS_MOVE_RE = re.compile(r'\d+\.')
+
 
 def find_first_annotation(pgn_line):
     """
@@ -18,60 +42,72 @@ def find_first_annotation(pgn_line):
     first mistake (? or $2) in a PGN line.
 
     Returns: (first_inaccuracy_move, first_mistake_move)
-             Returns float('inf') if annotation not found.
+             Returns INF if annotation not found.
     """
-    first_inaccuracy = float('inf')
-    first_mistake = float('inf')
+    first_inaccuracy = INF
+    first_mistake = INF
 
     # Track current move number
     current_move = 0
 
-    # Tokenize the PGN - split by whitespace but keep structure
-    # Remove comments in curly braces first
-    cleaned = re.sub(r'\{[^}]*\}', ' ', pgn_line)
-    # Remove variations in parentheses (simple single-level)
-    cleaned = re.sub(r'\([^)]*\)', ' ', cleaned)
-
-    tokens = cleaned.split()
-
-    for token in tokens:
-        # Check for move number (e.g., "1.", "1...", "12.")
-        move_match = re.match(r'^(\d+)\.', token)
-        if move_match:
-            current_move = int(move_match.group(1))
-            # Remove the move number prefix to check for annotation
-            token = re.sub(r'^\d+\.+', '', token)
-
-        # Check for NAG $6 (inaccuracy)
-        if token == '$6':
+    # Remove comments in curly braces first, then variations in
+    # parentheses (simple single-level); skip each pass when the line
+    # has nothing for it to remove
+    cleaned = pgn_line
+    if '{' in cleaned:
+        cleaned = _COMMENT_RE.sub(' ', cleaned)
+    if '(' in cleaned:
+        cleaned = _VAR_RE.sub(' ', cleaned)
+
+    for match in _SCAN_RE.finditer(cleaned):
+        kind = match.lastgroup
+
+        if match.group('mv'):
+            # Move number (e.g., "1.", "1...", "12.")
+            current_move = int(match.group('mv'))
+            nag = match.group('mvnag')
+        elif kind == 'nag':
+            nag = match.group('nag')
+        else:
+            nag = None
+
+        # NAG $6 or symbolic ?! (inaccuracy)
+        if nag == '6' or kind == 'inacc':
             if current_move < first_inaccuracy:
                 first_inaccuracy = current_move
+                # Move numbers only grow along the line, so once both are
+                # found nothing later can be earlier
+                if first_mistake != INF:
+                    break
 
-        # Check for NAG $2 (mistake)
-        if token == '$2':
+        # NAG $2 or symbolic ? (mistake)
+        elif nag == '2' or kind == 'mist':
             if current_move < first_mistake:
                 first_mistake = current_move
+                if first_inaccuracy != INF:
+                    break
 
-        # Check for symbolic annotations in the token
-        # Inaccuracy: ?! (but not preceded by !)
-        if re.search(r'[^!]\?!|^\?!', token):
-            if current_move < first_inaccuracy:
-                first_inaccuracy = current_move
+    return (first_inaccuracy, first_mistake)
 
-        # Mistake: single ? (not ?! or ??)
-        # Match ? that is not followed by ! or ? and not preceded by ?
-        if re.search(r'(?<!\?)\?(?![!?])', token):
-            if current_move < first_mistake:
-                first_mistake = current_move
 
-    return (first_inaccuracy, first_mistake)
+def _sorted_games(keys, lines):
+    """
+    Sort games given parallel lists of (first_inaccuracy, first_mistake, index)
+    keys and game text. Plain tuples compare in C with no key function, and the
+    index keeps ties in file order without ever comparing the game text.
+    """
+    keys.sort()
+    return [(inac, mist, lines[i]) for inac, mist, i in keys]
 
 
 def sort_pgn_file(filename):
     """
     Read PGN file and sort games by first annotation move number.
+
+    Returns: list of (first_inaccuracy, first_mistake, line), sorted
     """
-    games = []
+    keys = []
+    lines = []
 
     with open(filename, 'r') as f:
         for line in f:
@@ -80,42 +116,132 @@ def sort_pgn_file(filename):
                 continue
 
             # Skip header line if it doesn't look like PGN moves
-            if not re.search(r'\d+\.', line):
+            if not _HAS_MOVE_RE.search(line):
                 continue
 
-            first_inaccuracy, first_mistake = find_first_annotation(line)
-            games.append({
-                'line': line,
-                'first_inaccuracy': first_inaccuracy,
-                'first_mistake': first_mistake
-            })
+            # Lines without '?' or '$' can't hold an annotation; two
+            # substring checks are far cheaper than the regex scan
+            if '?' not in line and '$' not in line:
+                first_inaccuracy, first_mistake = INF, INF
+            else:
+                first_inaccuracy, first_mistake = find_first_annotation(line)
+            keys.append((first_inaccuracy, first_mistake, len(lines)))
+            lines.append(line)
+
+    return _sorted_games(keys, lines)
+
+
+class AnnotationVisitor(chess.pgn.BaseVisitor):
+    """
+    Visitor that records the move numbers of the first inaccuracy ($6 / ?!)
+    and first mistake ($2 / ?) on the mainline, without building a game tree.
+    """
+
+    def begin_game(self):
+        self.current_move = 0
+        self.first_inaccuracy = INF
+        self.first_mistake = INF
 
-    # Sort by first_inaccuracy, then first_mistake
-    games.sort(key=lambda g: (g['first_inaccuracy'], g['first_mistake']))
+    def begin_variation(self):
+        # Only the mainline counts, same as the line sorter
+        return chess.pgn.SKIP
 
-    return games
+    def begin_parse_san(self, board, san):
+        # Once both are found nothing later can be earlier, so stop paying
+        # for SAN parsing and just let the reader run to the end of the game
+        if self.first_inaccuracy != INF and self.first_mistake != INF:
+            return chess.pgn.SKIP
+
+    def visit_move(self, board, move):
+        # board is the position before the move, so this is the move's number
+        self.current_move = board.fullmove_number
+
+    def visit_nag(self, nag):
+        # The reader has already decoded ?! and ? into these NAG ints, and
+        # move numbers only grow, so the first one seen is the earliest
+        if nag == chess.pgn.NAG_DUBIOUS_MOVE:
+            if self.first_inaccuracy == INF:
+                self.first_inaccuracy = self.current_move
+        elif nag == chess.pgn.NAG_MISTAKE:
+            if self.first_mistake == INF:
+                self.first_mistake = self.current_move
+
+    def handle_error(self, error):
+        # Keep whatever was found before the bad move instead of aborting
+        pass
+
+    def result(self):
+        return (self.first_inaccuracy, self.first_mistake)
+
+
+class _RecordingReader:
+    """File wrapper that keeps the lines read_game consumed for one game."""
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.lines = []
+
+    def readline(self):
+        line = self.handle.readline()
+        self.lines.append(line)
+        return line
+
+    def take(self):
+        text = ''.join(self.lines).strip()
+        self.lines = []
+        return text
+
+
+def sort_pgn_games(filename):
+    """
+    Stream a standard PGN file (headers, wrapped movetext, blank line between
+    games) through python-chess and sort games by first annotation move number.
+    Returns the same (first_inaccuracy, first_mistake, text) list as sort_pgn_file.
+    """
+    keys = []
+    lines = []
+
+    with open(filename, 'r') as f:
+        reader = _RecordingReader(f)
+        while True:
+            result = chess.pgn.read_game(reader, Visitor=AnnotationVisitor)
+            text = reader.take()
+            if result is None:
+                break
+            if not text:
+                continue
+            first_inaccuracy, first_mistake = result
+            keys.append((first_inaccuracy, first_mistake, len(lines)))
+            lines.append(text)
+
+    return _sorted_games(keys, lines)
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python sort_pgn_by_annotation.py <pgn_file>", file=sys.stderr)
+    args = sys.argv[1:]
+    pgn_mode = '--pgn' in args
+    if pgn_mode:
+        args.remove('--pgn')
+
+    if not args:
+        print("Usage: python sort_pgn_by_annotation.py [--pgn] <pgn_file>", file=sys.stderr)
         print("Example: python sort_pgn_by_annotation.py piano_game.txt", file=sys.stderr)
+        print("  --pgn  read a standard multi-line PGN file (one game per block)", file=sys.stderr)
         sys.exit(1)
 
-    filename = sys.argv[1]
+    filename = args[0]
 
     try:
-        games = sort_pgn_file(filename)
-
-        # Print sorted games
-        for game in games:
-            inac = game['first_inaccuracy']
-            mist = game['first_mistake']
-            inac_str = str(int(inac)) if inac != float('inf') else '-'
-            mist_str = str(int(mist)) if mist != float('inf') else '-'
-            print(f"# First ?!: move {inac_str}, First ?: move {mist_str}")
-            print(game['line'])
-            print()
+        games = sort_pgn_games(filename) if pgn_mode else sort_pgn_file(filename)
+
+        # Print sorted games, built up and written in one go rather than
+        # three print() calls per game
+        out = []
+        for inac, mist, line in games:
+            inac_str = str(int(inac)) if inac != INF else '-'
+            mist_str = str(int(mist)) if mist != INF else '-'
+            out.append(f"# First ?!: move {inac_str}, First ?: move {mist_str}\n{line}\n\n")
+        sys.stdout.write(''.join(out))
 
     except FileNotFoundError:
         print(f"Error: File '{filename}' not found", file=sys.stderr)
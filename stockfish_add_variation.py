@@ -11,45 +11,93 @@ Usage:
     --move "12..." = Black's 12th move
     --lines N      = Number of alternative lines to add (default: 3)
     --depth D      = Stockfish search depth (default: 18)
+
+    Repeat --move to analyze several positions with one Stockfish process.
 """
 
 import argparse
 import chess
 import chess.pgn
 import chess.engine
+import collections
+import contextlib
+import functools
 import io
+import itertools
+import json
+import multiprocessing.util
 import os
+import shutil
+import sqlite3
 import sys
 import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Engine settings used when this script owns the Stockfish process. The
+# hash carries over between positions, so one long-lived engine is much
+# cheaper than starting (and loading NNUE) once per position
+ENGINE_OPTIONS = {"Hash": 512, "Threads": max(1, (os.cpu_count() or 2) - 1)}
+# Batch workers run one single-threaded engine each, one per core
+WORKER_ENGINE_OPTIONS = {"Hash": 512, "Threads": 1}
+
+# On-disk cache of finished analyses, so re-running on an edited PGN
+# doesn't search the same positions again
+ANALYSIS_CACHE_PATH = os.path.expanduser("~/.cache/stockfish_variations.db")
+_analysis_cache = None
 
+# Patterns compiled once at import
+_MOVE_LOC_RE = re.compile(r'^(\d+)(\.{1,3})$')
+# Black move number such as "12..."
+_BLACK_NUM_RE = re.compile(r'\d+\.\.\.')
 
+
+@functools.lru_cache(maxsize=1)
 def find_stockfish():
-    """Find Stockfish executable in common locations"""
-    common_paths = [
+    """Find Stockfish from $STOCKFISH_PATH, PATH, or common locations"""
+    found = os.environ.get("STOCKFISH_PATH") or shutil.which("stockfish")
+    if found:
+        return found
+
+    common_paths = (
         "/usr/local/bin/stockfish",
         "/usr/bin/stockfish",
         "/opt/homebrew/bin/stockfish",
         os.path.expanduser("~/stockfish/stockfish"),
         os.path.expanduser("~/bin/stockfish"),
-        "stockfish",  # Try PATH
-    ]
+    )
 
     for path in common_paths:
         if os.path.isfile(path) and os.access(path, os.X_OK):
             return path
-        # Try running it from PATH
-        if path == "stockfish":
-            try:
-                import shutil
-                found = shutil.which("stockfish")
-                if found:
-                    return found
-            except:
-                pass
-
     return None
 
 
+def _resolve_stockfish(stockfish_path=None):
+    """Return stockfish_path, or the found Stockfish; raise if there is none."""
+    if not stockfish_path:
+        stockfish_path = find_stockfish()
+
+    if not stockfish_path:
+        raise RuntimeError(
+            "Stockfish not found. Install it with:\n"
+            "  macOS: brew install stockfish\n"
+            "  Ubuntu: sudo apt install stockfish\n"
+            "Or specify path with --stockfish-path"
+        )
+    return stockfish_path
+
+
+def open_engine(stockfish_path=None, options=None):
+    """
+    Start Stockfish configured with options (default: ENGINE_OPTIONS).
+
+    The caller owns the returned engine and must call engine.quit().
+    """
+    engine = chess.engine.SimpleEngine.popen_uci(_resolve_stockfish(stockfish_path))
+    engine.configure(ENGINE_OPTIONS if options is None else options)
+    return engine
+
+
 def parse_move_location(move_str):
     """
     Parse move location string like "12." or "12..."
@@ -62,7 +110,7 @@ def parse_move_location(move_str):
     move_str = move_str.strip()
 
     # Match patterns like "12." or "12..."
-    match = re.match(r'^(\d+)(\.{1,3})$', move_str)
+    match = _MOVE_LOC_RE.match(move_str)
     if not match:
         raise ValueError(f"Invalid move format: '{move_str}'. Use '12.' for White or '12...' for Black")
 
@@ -86,7 +134,6 @@ def get_position_at_move(game, move_number, is_black_move):
         (board, node) - Board at position, and the node of the move to replace
     """
     board = game.board()
-    node = game
 
     # Calculate the ply (half-move) index
     # Move 1. e4 is ply 0, 1... e5 is ply 1
@@ -96,30 +143,62 @@ def get_position_at_move(game, move_number, is_black_move):
     if is_black_move:
         target_ply += 1
 
-    current_ply = 0
-
-    while node.variations:
-        next_node = node.variation(0)  # Follow main line
-
-        if current_ply == target_ply:
+    # Walk only as far along the main line as the target move
+    for ply, node in enumerate(itertools.islice(game.mainline(), max(target_ply + 1, 0))):
+        if ply == target_ply:
             # We're at the position BEFORE the target move
             # Return the board and the node containing the move
-            return board, next_node
+            return board, node
 
-        board.push(next_node.move)
-        node = next_node
-        current_ply += 1
+        board.push(node.move)
 
     raise ValueError(f"Move {move_number}{'...' if is_black_move else '.'} not found in game")
 
 
+def _open_analysis_cache():
+    """Open the analysis cache once; returns None if it can't be created."""
+    global _analysis_cache
+    if _analysis_cache is None:
+        try:
+            os.makedirs(os.path.dirname(ANALYSIS_CACHE_PATH), exist_ok=True)
+            db = sqlite3.connect(ANALYSIS_CACHE_PATH)
+            db.execute("CREATE TABLE IF NOT EXISTS analysis (key TEXT PRIMARY KEY, value TEXT)")
+            _analysis_cache = db
+        except (OSError, sqlite3.Error):
+            _analysis_cache = False
+    return _analysis_cache or None
+
+
 def analyze_position(board, engine, num_lines=3, depth=18):
     """
     Analyze position with Stockfish and return top moves.
 
+    Results are cached on disk by FEN, depth, line count and engine name,
+    so a different Stockfish version never reuses another's analysis.
+
     Returns:
         List of (move, score, pv) tuples
     """
+    cache = _open_analysis_cache()
+    key = f"{board.fen()}|{depth}|{num_lines}|{engine.id.get('name', '')}"
+    if cache:
+        try:
+            row = cache.execute("SELECT value FROM analysis WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            # e.g. locked by another batch worker; just search
+            row = None
+        if row:
+            results = []
+            for move_uci, score_str, pv_uci in json.loads(row[0]):
+                move = chess.Move.from_uci(move_uci)
+                results.append({
+                    'move': move,
+                    'score': score_str,
+                    'pv': [chess.Move.from_uci(m) for m in pv_uci],
+                    'san': board.san(move)
+                })
+            return results
+
     # Get multiple principal variations
     info_list = engine.analyse(
         board,
@@ -152,6 +231,15 @@ def analyze_position(board, engine, num_lines=3, depth=18):
                 'san': board.san(move)
             })
 
+    if cache:
+        value = json.dumps([(r['move'].uci(), r['score'], [m.uci() for m in r['pv']])
+                            for r in results])
+        try:
+            with cache:
+                cache.execute("INSERT OR REPLACE INTO analysis VALUES (?, ?)", (key, value))
+        except sqlite3.Error:
+            pass
+
     return results
 
 
@@ -164,73 +252,69 @@ def format_variation_line(board, pv, move_number, is_black_move):
         pv: List of moves (principal variation)
         move_number: Starting move number
         is_black_move: True if variation starts with Black's move
+
+    The moves are pushed onto board and popped again before returning, so
+    the caller gets it back unchanged without paying for a copy.
     """
-    temp_board = board.copy()
     parts = []
+    pushed = 0
 
-    for i, move in enumerate(pv):
-        current_move_num = move_number + (i + (1 if is_black_move else 0)) // 2
-        is_black = (i + (1 if is_black_move else 0)) % 2 == 1
+    try:
+        for i, move in enumerate(pv):
+            current_move_num = move_number + (i + (1 if is_black_move else 0)) // 2
+            is_black = (i + (1 if is_black_move else 0)) % 2 == 1
 
-        san = temp_board.san(move)
+            san = board.san(move)
 
-        if i == 0:
-            # First move always gets move number
-            if is_black_move:
-                parts.append(f"{move_number}... {san}")
+            if i == 0:
+                # First move always gets move number
+                if is_black_move:
+                    parts.append(f"{move_number}... {san}")
+                else:
+                    parts.append(f"{move_number}. {san}")
+            elif not is_black:
+                # White's move after first
+                parts.append(f"{current_move_num}. {san}")
             else:
-                parts.append(f"{move_number}. {san}")
-        elif not is_black:
-            # White's move after first
-            parts.append(f"{current_move_num}. {san}")
-        else:
-            # Black's move (no number needed unless first)
-            parts.append(san)
+                # Black's move (no number needed unless first)
+                parts.append(san)
 
-        temp_board.push(move)
+            board.push(move)
+            pushed += 1
+    finally:
+        for _ in range(pushed):
+            board.pop()
 
     return ' '.join(parts)
 
 
-def add_variations_to_pgn(pgn_string, move_location, num_lines=3, depth=18, stockfish_path=None):
+def positions_to_analyze(game, move_locations, errors):
     """
-    Add Stockfish variations at specified move location.
-
-    Args:
-        pgn_string: PGN text
-        move_location: String like "12." or "12..."
-        num_lines: Number of alternative lines
-        depth: Stockfish search depth
-        stockfish_path: Path to Stockfish executable
+    Yield (move_number, is_black_move, board, target_node) for each move
+    location on the game's mainline, in order. Locations that are malformed
+    or not in the game are skipped, and their messages appended to errors.
+    """
+    for move_location in move_locations:
+        try:
+            move_number, is_black_move = parse_move_location(move_location)
+            board, target_node = get_position_at_move(game, move_number, is_black_move)
+        except ValueError as e:
+            errors.append(str(e))
+            continue
+        yield move_number, is_black_move, board, target_node
+
+
+def _add_variations_at(board, target_node, move_number, is_black_move, engine, num_lines, depth,
+                       trust_pv=False, warmup_depths=()):
+    """
+    Analyze the position before target_node and add the engine's
+    alternatives to the played move as variations. With trust_pv the PV
+    moves are added without a legality check. Each of warmup_depths is
+    searched and reported first; only the depth search adds variations.
 
     Returns:
-        Modified PGN string with variations
+        True if any variations were added
     """
-    # Parse move location
-    move_number, is_black_move = parse_move_location(move_location)
-
-    # Find Stockfish
-    if not stockfish_path:
-        stockfish_path = find_stockfish()
-
-    if not stockfish_path:
-        raise RuntimeError(
-            "Stockfish not found. Install it with:\n"
-            "  macOS: brew install stockfish\n"
-            "  Ubuntu: sudo apt install stockfish\n"
-            "Or specify path with --stockfish-path"
-        )
-
-    # Parse PGN
-    pgn_io = io.StringIO(pgn_string)
-    game = chess.pgn.read_game(pgn_io)
-
-    if not game:
-        raise ValueError("Could not parse PGN")
-
-    # Get position at the specified move
-    board, target_node = get_position_at_move(game, move_number, is_black_move)
-
     # The actual move played
     played_move = target_node.move
     played_san = board.san(played_move)
@@ -239,9 +323,15 @@ def add_variations_to_pgn(pgn_string, move_location, num_lines=3, depth=18, stoc
     print(f"FEN: {board.fen()}")
     print(f"Searching depth {depth} for {num_lines} lines...\n")
 
-    # Analyze with Stockfish
-    with chess.engine.SimpleEngine.popen_uci(stockfish_path) as engine:
-        alternatives = analyze_position(board, engine, num_lines, depth)
+    # Shallow searches give a quick first answer, and the engine's hash
+    # keeps their work for the deeper ones on the same position
+    for warmup_depth in warmup_depths:
+        best = analyze_position(board, engine, num_lines, warmup_depth)
+        if best:
+            line_str = format_variation_line(board, best[0]['pv'], move_number, is_black_move)
+            print(f"  depth {warmup_depth}: [{best[0]['score']}] {line_str}")
+
+    alternatives = analyze_position(board, engine, num_lines, depth)
 
     # Display results
     print("Stockfish analysis:")
@@ -257,7 +347,7 @@ def add_variations_to_pgn(pgn_string, move_location, num_lines=3, depth=18, stoc
 
     if not variation_lines:
         print("\nThe played move was the best move! No variations to add.")
-        return pgn_string
+        return False
 
     print(f"\nAdding {len(variation_lines)} variation(s) to PGN...")
 
@@ -269,15 +359,114 @@ def add_variations_to_pgn(pgn_string, move_location, num_lines=3, depth=18, stoc
         var_node = parent_node.add_variation(alt['move'])
         var_node.comment = f"Stockfish: {alt['score']}"
 
-        # Add rest of the PV as continuation
-        temp_board = board.copy()
-        temp_board.push(alt['move'])
+        # Add rest of the PV as continuation, pushing onto the shared
+        # board and unwinding afterwards
+        board.push(alt['move'])
+        pushed = 1
         current_var_node = var_node
 
-        for continuation_move in alt['pv'][1:]:
-            if continuation_move in temp_board.legal_moves:
-                current_var_node = current_var_node.add_variation(continuation_move)
-                temp_board.push(continuation_move)
+        try:
+            for continuation_move in alt['pv'][1:]:
+                if trust_pv or board.is_legal(continuation_move):
+                    current_var_node = current_var_node.add_variation(continuation_move)
+                    board.push(continuation_move)
+                    pushed += 1
+        finally:
+            for _ in range(pushed):
+                board.pop()
+
+    return True
+
+
+def add_variations_to_game(game, move_location, num_lines=3, depth=18, stockfish_path=None,
+                           engine=None, trust_pv=False, warmup_depths=(), errors=None):
+    """
+    Add Stockfish variations to a parsed game in place, without exporting it.
+
+    Takes the same arguments as add_variations_to_pgn, with a
+    chess.pgn.Game instead of PGN text. The caller decides whether and how
+    to serialize the game (StringExporter, FileExporter, ...).
+
+    Returns:
+        True if any variations were added
+    """
+    report = errors is None
+    if report:
+        errors = []
+
+    if isinstance(move_location, str):
+        move_locations = [move_location]
+    else:
+        move_locations = list(move_location)
+
+    owns_engine = engine is None
+    if owns_engine:
+        engine = open_engine(stockfish_path)
+
+    added = False
+    try:
+        # Find the next position on a worker thread while the engine
+        # searches the current one; the engine call waits on IPC, so the
+        # two overlap
+        positions = positions_to_analyze(game, move_locations, errors)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pending = executor.submit(next, positions, None)
+            while True:
+                position = pending.result()
+                if position is None:
+                    break
+                pending = executor.submit(next, positions, None)
+                move_number, is_black_move, board, target_node = position
+                if _add_variations_at(board, target_node, move_number, is_black_move,
+                                      engine, num_lines, depth, trust_pv, warmup_depths):
+                    added = True
+    finally:
+        if owns_engine:
+            engine.quit()
+
+    if report:
+        for error in errors:
+            print(f"Warning: skipping {error}", file=sys.stderr)
+
+    return added
+
+
+def add_variations_to_pgn(pgn_string, move_location, num_lines=3, depth=18, stockfish_path=None,
+                          engine=None, trust_pv=False, warmup_depths=(), errors=None):
+    """
+    Add Stockfish variations at specified move location.
+
+    Args:
+        pgn_string: PGN text
+        move_location: String like "12." or "12...", or a list of them
+        num_lines: Number of alternative lines
+        depth: Stockfish search depth
+        stockfish_path: Path to Stockfish executable
+        engine: Already-running engine to reuse; if None, one is started
+                for this call and closed afterwards
+        trust_pv: Skip legality checks on PV moves (engine PVs from a
+                  legal position are legal)
+        warmup_depths: Shallower depths to search (and print) first on
+                       the same engine before the full-depth search
+        errors: List to collect the messages for move locations that are
+                malformed or not in the game; if None they are printed to
+                stderr. Either way those locations are skipped and the rest
+                still analyzed
+
+    Returns:
+        Modified PGN string with variations (pgn_string itself, unexported,
+        if nothing was added)
+    """
+    # Parse PGN
+    pgn_io = io.StringIO(pgn_string)
+    game = chess.pgn.read_game(pgn_io)
+
+    if not game:
+        raise ValueError("Could not parse PGN")
+
+    if not add_variations_to_game(game, move_location, num_lines, depth, stockfish_path,
+                                  engine, trust_pv, warmup_depths, errors):
+        return pgn_string
 
     # Export modified PGN
     exporter = chess.pgn.StringExporter(headers=True, variations=True, comments=True)
@@ -286,20 +475,132 @@ def add_variations_to_pgn(pgn_string, move_location, num_lines=3, depth=18, stoc
     return modified_pgn
 
 
+# Engine held by each batch worker process for its whole lifetime
+_worker_engine = None
+
+
+def _init_worker(stockfish_path):
+    """ProcessPoolExecutor initializer: start this worker's engine."""
+    global _worker_engine
+    _worker_engine = open_engine(stockfish_path, WORKER_ENGINE_OPTIONS)
+    # Pool workers end with os._exit, so atexit never runs; a Finalize
+    # runs before the interpreter joins the engine's non-daemon thread,
+    # which would otherwise keep the worker (and the pool) alive forever
+    multiprocessing.util.Finalize(_worker_engine, _worker_engine.quit, exitpriority=10)
+
+
+def _annotate_in_worker(task):
+    """Add variations to one game on the worker's engine; returns (pgn, errors)."""
+    pgn_string, move_locations, num_lines, depth, trust_pv, warmup_depths = task
+    errors = []
+    # The per-move report would interleave across workers, so drop it
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            return add_variations_to_pgn(pgn_string, move_locations, num_lines, depth,
+                                         engine=_worker_engine, trust_pv=trust_pv,
+                                         warmup_depths=warmup_depths, errors=errors), errors
+        except ValueError as e:
+            # Unparseable game
+            return pgn_string, errors + [str(e)]
+
+
+class _LineRecorder:
+    """File wrapper that keeps the lines a PGN reader consumed."""
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.lines = []
+
+    def readline(self):
+        line = self.handle.readline()
+        self.lines.append(line)
+        return line
+
+    def take(self):
+        text = ''.join(self.lines).strip()
+        self.lines = []
+        return text
+
+
+def _read_game_texts(handle):
+    """
+    Yield the raw PGN text of each game in handle. Games are only skipped
+    over (no SAN parsing) to find where they end; workers do the parsing.
+    """
+    reader = _LineRecorder(handle)
+    while chess.pgn.skip_game(reader):
+        text = reader.take()
+        if text:
+            yield text
+
+
+def batch_annotate(pgn_file, move_locations, workers=None, num_lines=3, depth=18,
+                   stockfish_path=None, trust_pv=False, warmup_depths=()):
+    """
+    Add variations at the same move locations to every game in a PGN file,
+    one game per worker process, each with its own single-threaded engine.
+
+    Move locations a game doesn't reach are skipped with a warning; the
+    game keeps the variations added at its other locations.
+
+    Games are read from the file as workers free up, with only a couple per
+    worker queued at a time, so memory stays flat however large the file.
+
+    Yields:
+        PGN strings, in file order, as they finish, so callers can write
+        each one out instead of holding the whole file
+    """
+    if isinstance(move_locations, str):
+        move_locations = [move_locations]
+    stockfish_path = _resolve_stockfish(stockfish_path)
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    max_pending = workers * 2
+    task_args = (list(move_locations), num_lines, depth, trust_pv, tuple(warmup_depths))
+
+    with open(pgn_file, 'r') as f:
+        games = _read_game_texts(f)
+        # Read the first batch before starting the pool: with fork it starts
+        # every worker (and engine) at once, so don't start more than a
+        # short file needs
+        first = list(itertools.islice(games, max_pending))
+        if not first:
+            return
+        if len(first) < max_pending:
+            workers = min(workers, len(first))
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(stockfish_path,)) as executor:
+            pending = collections.deque(
+                executor.submit(_annotate_in_worker, (pgn,) + task_args) for pgn in first)
+            index = 0
+            while pending:
+                result, errors = pending.popleft().result()
+                # Keep the queue topped up from the file
+                for pgn in itertools.islice(games, max_pending - len(pending)):
+                    pending.append(executor.submit(_annotate_in_worker, (pgn,) + task_args))
+
+                index += 1
+                for error in errors:
+                    print(f"Warning: game {index}: {error}", file=sys.stderr)
+                yield result
+
+
 def clean_pgn_format(pgn_string):
     """
     Clean PGN format - handles non-standard formats like '1. e4 1... e5'
     """
+    # split() also collapses runs of whitespace, so text without "..."
+    # only needs the join
+    tokens = pgn_string.split()
+    if '...' not in pgn_string:
+        return ' '.join(tokens)
+
     # Remove redundant black move numbers like "1... e5" -> just keep the move
     # Standard PGN is "1. e4 e5" not "1. e4 1... e5"
-
-    # Pattern: digit followed by "..." - remove the number part but keep the move
-    cleaned = re.sub(r'\d+\.\.\.\s*', '', pgn_string)
-
-    # Clean up multiple spaces
-    cleaned = re.sub(r'\s+', ' ', cleaned)
-
-    return cleaned.strip()
+    # Only tokens holding "..." need the pattern; "(3...Nf6" -> "(Nf6"
+    cleaned = (_BLACK_NUM_RE.sub('', tok) if '...' in tok else tok for tok in tokens)
+    return ' '.join(tok for tok in cleaned if tok)
 
 
 def main():
@@ -314,25 +615,91 @@ Examples:
     # Analyze Black's 8th move with 5 alternatives at depth 20
     python stockfish_add_variation.py game.pgn --move "8..." --lines 5 --depth 20
 
+    # Quick depth-14 answer first, then depth 20 on the same engine
+    python stockfish_add_variation.py game.pgn --move "12." --depths 14,20
+
+    # Analyze several moves with one Stockfish process
+    python stockfish_add_variation.py game.pgn --move "8..." --move "12." --move "15."
+
     # Use inline PGN
     python stockfish_add_variation.py "1. e4 e5 2. Nf3 Nc6" --move "2."
+
+    # Every game in a multi-game PGN file, one engine per core
+    python stockfish_add_variation.py games.pgn --move "12." --batch -o annotated.pgn
         '''
     )
 
     parser.add_argument('pgn', help='PGN file path or PGN string')
-    parser.add_argument('--move', '-m', required=True,
-                        help='Move location: "12." for White\'s 12th, "12..." for Black\'s 12th')
+    parser.add_argument('--move', '-m', required=True, action='append',
+                        help='Move location: "12." for White\'s 12th, "12..." for Black\'s 12th '
+                             '(repeat to analyze several moves)')
     parser.add_argument('--lines', '-l', type=int, default=3,
                         help='Number of alternative lines (default: 3)')
     parser.add_argument('--depth', '-d', type=int, default=18,
                         help='Stockfish search depth (default: 18)')
+    parser.add_argument('--depths',
+                        help='Comma-separated depths to search in turn, e.g. "14,18"; '
+                             'the deepest is used for the variations (overrides --depth)')
     parser.add_argument('--stockfish-path', '-s',
                         help='Path to Stockfish executable')
+    parser.add_argument('--trust-pv', action='store_true',
+                        help='Add engine lines without checking each move is legal')
+    parser.add_argument('--batch', action='store_true',
+                        help='Treat the PGN file as many games and annotate each in parallel')
+    parser.add_argument('--workers', '-w', type=int,
+                        help='Worker processes for --batch (default: CPU count)')
     parser.add_argument('--output', '-o',
                         help='Output file (default: print to stdout)')
 
     args = parser.parse_args()
 
+    warmup_depths = ()
+    if args.depths:
+        try:
+            depths = sorted({int(d) for d in args.depths.split(',') if d.strip()})
+        except ValueError:
+            parser.error(f"--depths must be comma-separated integers, got '{args.depths}'")
+        if not depths:
+            parser.error("--depths needs at least one depth")
+        args.depth = depths[-1]
+        warmup_depths = tuple(depths[:-1])
+
+    # Reject malformed move locations before starting an engine or a pool
+    for move_location in args.move:
+        try:
+            parse_move_location(move_location)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.batch:
+        results = batch_annotate(
+            args.pgn,
+            args.move,
+            workers=args.workers,
+            num_lines=args.lines,
+            depth=args.depth,
+            stockfish_path=args.stockfish_path,
+            trust_pv=args.trust_pv,
+            warmup_depths=warmup_depths
+        )
+        # Write each game as it comes back rather than joining them all
+        out = open(args.output, 'w') if args.output else sys.stdout
+        count = 0
+        try:
+            for pgn in results:
+                out.write(pgn + '\n\n')
+                count += 1
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        if args.output:
+            print(f"Annotated {count} game(s), saved to: {args.output}")
+        return
+
     # Read PGN
     if os.path.isfile(args.pgn):
         with open(args.pgn, 'r') as f:
@@ -341,17 +708,22 @@ Examples:
         pgn_string = args.pgn
 
     # Clean PGN format if needed
-    if re.search(r'\d+\.\.\.', pgn_string):
+    if _BLACK_NUM_RE.search(pgn_string):
         print("Detected non-standard PGN format, cleaning...")
         pgn_string = clean_pgn_format(pgn_string)
 
+    engine = None
     try:
+        # One engine for every requested move
+        engine = open_engine(args.stockfish_path)
         result = add_variations_to_pgn(
             pgn_string,
             args.move,
             num_lines=args.lines,
             depth=args.depth,
-            stockfish_path=args.stockfish_path
+            engine=engine,
+            trust_pv=args.trust_pv,
+            warmup_depths=warmup_depths
         )
 
         print("\n" + "="*60)
@@ -368,6 +740,10 @@ Examples:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
 
+    finally:
+        if engine is not None:
+            engine.quit()
+
 
 if __name__ == "__main__":
     main()
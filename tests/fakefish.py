@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Minimal UCI engine for tests: answers every search instantly with the
+legal moves of the position, in UCI order, as its MultiPV lines.
+"""
+
+import sys
+
+import chess
+
+
+def main():
+    board = chess.Board()
+    multipv = 1
+    for line in sys.stdin:
+        tokens = line.split()
+        if not tokens:
+            continue
+        command = tokens[0]
+        if command == 'uci':
+            print('id name Fakefish')
+            print('option name MultiPV type spin default 1 min 1 max 500')
+            print('option name Hash type spin default 16 min 1 max 33554432')
+            print('option name Threads type spin default 1 min 1 max 1024')
+            print('uciok')
+        elif command == 'isready':
+            print('readyok')
+        elif command == 'setoption' and 'MultiPV' in tokens:
+            multipv = int(tokens[-1])
+        elif command == 'position':
+            if tokens[1] == 'startpos':
+                board = chess.Board()
+                rest = tokens[2:]
+            else:
+                board = chess.Board(' '.join(tokens[2:8]))
+                rest = tokens[8:]
+            for uci in rest[1:] if rest[:1] == ['moves'] else []:
+                board.push_uci(uci)
+        elif command == 'go':
+            moves = sorted(board.legal_moves, key=lambda m: m.uci())
+            for i, move in enumerate(moves[:multipv], 1):
+                print(f'info depth 1 multipv {i} score cp {-10 * i} pv {move.uci()}')
+            print(f'bestmove {moves[0].uci() if moves else "(none)"}')
+        elif command == 'quit':
+            break
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import contextlib
+import importlib.util
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+spec = importlib.util.spec_from_file_location(
+    'chess_grab_five_games', os.path.join(ROOT, 'chess_grab_five_games.py'))
+grab = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(grab)
+
+PGN = '''[Event "Live Chess"]
+[White "tttstanley"]
+[Black "{opponent}"]
+[Result "1-0"]
+[ECO "C50"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5 1-0
+'''
+
+
+def make_game(i, with_pgn=True):
+    game = {'uuid': f'uuid-{i}', 'end_time': i}
+    if with_pgn:
+        game['pgn'] = PGN.format(opponent=f'opponent{i}')
+    return game
+
+
+class SavedGameIndexTest(unittest.TestCase):
+
+    def run_main(self, output_file, games):
+        grab.fetch_games = lambda username, num_games: list(games)
+        argv = sys.argv
+        sys.argv = ['chess_grab_five_games.py', output_file]
+        try:
+            with contextlib.redirect_stdout(io.StringIO()) as out:
+                grab.main()
+        finally:
+            sys.argv = argv
+        return out.getvalue()
+
+    def test_rerun_after_zero_key_append(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output_file = os.path.join(tmp, 'games.txt')
+            saved = [make_game(1), make_game(2)]
+
+            self.run_main(output_file, saved)
+            # Only new game has no PGN: the output gets separators but no
+            # keys are recorded
+            self.run_main(output_file, saved + [make_game(3, with_pgn=False)])
+            out = self.run_main(output_file, saved)
+
+            self.assertNotIn('stale', out)
+            self.assertIn('No new games to save', out)
+            with open(output_file) as f:
+                text = f.read()
+            self.assertEqual(text.count('opponent1'), 1)
+            self.assertEqual(text.count('opponent2'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'stockfish_add_variation.py')
+FAKEFISH = os.path.join(ROOT, 'tests', 'fakefish.py')
+
+GAMES = '''[Event "A"]
+
+1. e4 e5 2. Nf3 Nc6 *
+
+[Event "B"]
+
+1. d4 d5 2. c4 e6 *
+
+[Event "C"]
+
+1. e4 *
+'''
+
+
+class BatchModeTest(unittest.TestCase):
+
+    def test_batch_mode_exits(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pgn = os.path.join(tmp, 'games.pgn')
+            out = os.path.join(tmp, 'annotated.pgn')
+            with open(pgn, 'w') as f:
+                f.write(GAMES)
+            # Keep the analysis cache out of the real home directory
+            env = dict(os.environ, HOME=tmp)
+
+            result = subprocess.run(
+                [sys.executable, SCRIPT, pgn, '--move', '1.', '--move', '2.', '--batch',
+                 '-s', FAKEFISH, '-w', '2', '-o', out],
+                env=env, capture_output=True, text=True, timeout=60,
+            )
+
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn('Annotated 3 game(s)', result.stdout)
+            with open(out) as f:
+                text = f.read()
+            self.assertEqual(text.count('[Event '), 3)
+            # Game C has no second move: that location is skipped with a
+            # warning, but the variations at move 1 are kept
+            self.assertIn('game 3: Move 2. not found', result.stderr)
+            for game in text.split('[Event ')[1:]:
+                self.assertIn('{ Stockfish:', game)
+
+
+if __name__ == '__main__':
+    unittest.main()